@@ -1,41 +1,234 @@
-import os, gzip, csv, re
+import os, gzip, csv, re, time, argparse, hashlib, json
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from urllib.parse import urlsplit
 from xml.etree import ElementTree as ET
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 ROOT = Path(".")
-urls = set()
 
-def read_xml_bytes(p: Path) -> bytes:
-    if p.suffix == ".gz":
-        with gzip.open(p, "rb") as f: return f.read()
-    return p.read_bytes()
+SM_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+LOC_TAGS = (SM_NS + "loc", "loc")
+ENTRY_TAGS = (SM_NS + "url", SM_NS + "sitemap", "url", "sitemap")
+LASTMOD_TAGS = (SM_NS + "lastmod", "lastmod")
+MANIFEST = Path("extract_manifest.json")
+CHUNK_SIZE = 64 * 1024
+LOC_RE = re.compile(rb"<loc>(.*?)</loc>", flags=re.I|re.S)
 
-def extract_urls_from_xml(data: bytes):
-    # tenta XML normal; se quebrar, faz fallback com regex simples
-    try:
-        root = ET.fromstring(data)
-        ns = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
-        # pega <url><loc> e também <sitemap><loc> (caso seja index)
-        for tag in ("{http://www.sitemaps.org/schemas/sitemap/0.9}loc", "loc"):
-            for loc in root.findall(f".//{tag}"):
-                if loc.text: yield loc.text.strip()
-        for loc in root.findall(".//sm:loc", ns):
-            if loc.text: yield loc.text.strip()
-    except Exception:
-        for m in re.finditer(rb"<loc>(.*?)</loc>", data, flags=re.I|re.S):
+# tipo de cada URL pelo nome do sitemap de onde veio (Shopify e WordPress/Yoast); o primeiro que casar vale
+SOURCE_TYPES = [
+    (re.compile(r"^(sitemap_products|product-sitemap)"), "product"),
+    (re.compile(r"^(sitemap_blogs|post-sitemap)"), "post"),
+    (re.compile(r"^sitemap_collections"), "collection"),
+    (re.compile(r"^(sitemap_pages|page-sitemap)"), "page"),
+    (re.compile(r"^category-sitemap"), "blog_category"),
+    (re.compile(r"^post_tag-sitemap"), "blog_tag"),
+    (re.compile(r"^product_cat-sitemap"), "product_category"),
+    (re.compile(r"^product_tag-sitemap"), "product_tag"),
+    (re.compile(r"^pa_"), "attribute"),
+    (re.compile(r"^author-sitemap"), "author"),
+    (re.compile(r"^contest"), "contest"),
+    (re.compile(r"^sitemap(_index)?\.xml"), "sitemap"),
+]
+SITEMAP_URL_RE = re.compile(r"\.xml(\.gz)?(\?.*)?$", flags=re.I)
+CATALOG_COLUMNS = ["url", "source", "lastmod", "host"]
+
+def open_xml(p: Path):
+    if p.suffix == ".gz": return gzip.open(p, "rb")
+    return open(p, "rb")
+
+def iter_chunks(p: Path, size: int = CHUNK_SIZE):
+    with open_xml(p) as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk: return
+            yield chunk
+
+def scan_locs(p: Path, skip: int = 0):
+    # fallback: varre os bytes em blocos procurando <loc>...</loc>
+    buf = b""
+    for chunk in iter_chunks(p):
+        buf += chunk
+        end = 0
+        for m in LOC_RE.finditer(buf):
+            end = m.end()
+            if skip:
+                skip -= 1; continue
             try: yield m.group(1).decode().strip()
             except: pass
+        # guarda só o resto que pode conter um <loc> ainda incompleto
+        buf = buf[end:]
+        start = buf.lower().rfind(b"<loc")
+        buf = buf[start:] if start != -1 else buf[-4:]
+
+def extract_entries(p: Path):
+    # parse incremental: cada <loc> sai uma vez só, junto com o <lastmod> do mesmo <url>/<sitemap>,
+    # e a árvore é limpa ao fim de cada entrada
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    count = 0
+    in_entry = False
+    loc = lastmod = None
+    try:
+        for chunk in iter_chunks(p):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None: root = elem
+                    elif elem.tag in ENTRY_TAGS: in_entry, loc, lastmod = True, None, None
+                    continue
+                if elem.tag in LOC_TAGS:
+                    text = (elem.text or "").strip()
+                    if loc is not None:
+                        count += 1; yield loc, lastmod
+                        loc = None
+                    if in_entry and text: loc = text
+                    else:
+                        count += 1
+                        if text: yield text, None
+                elif elem.tag in LASTMOD_TAGS:
+                    lastmod = (elem.text or "").strip() or None
+                elif elem.tag in ENTRY_TAGS and root is not None:
+                    if loc is not None:
+                        count += 1; yield loc, lastmod
+                    in_entry, loc = False, None
+                    root.clear()
+        parser.close()
+    except ET.ParseError:
+        # XML quebrado: continua pelo regex, pulando os <loc> já emitidos
+        for u in scan_locs(p, skip=count): yield u, None
+
+def extract_urls_from_xml(p: Path):
+    for u, _ in extract_entries(p): yield u
+
+def is_sitemap(p: Path) -> bool:
+    return p.is_file() and (p.suffix in [".xml"] or p.suffixes[-2:]==[".xml",".gz"] or p.suffix==".gz")
+
+def source_type(p: Path, url: str = "") -> str:
+    # <loc> que aponta pra outro sitemap é índice, não importa em qual arquivo está
+    if SITEMAP_URL_RE.search(url): return "sitemap"
+    name = p.name.lower()
+    for pattern, kind in SOURCE_TYPES:
+        if pattern.match(name): return kind
+    return "other"
+
+def build_catalog(sources: dict):
+    # uma linha por URL: o primeiro sitemap (em ordem de caminho) define o tipo; lastmod de qualquer um
+    rows = {}
+    for p in sorted(sources):
+        for u, lastmod in sources[p].items():
+            if u not in rows: rows[u] = [u, source_type(p, u), lastmod, urlsplit(u).hostname or ""]
+            elif lastmod and not rows[u][2]: rows[u][2] = lastmod
+    return [rows[u] for u in sorted(rows)]
+
+def write_catalog(rows) -> Path:
+    # colunar (parquet, tipo e host como dicionário) com pyarrow; senão CSV
+    if pa is None:
+        path = Path("catalog.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f); w.writerow(CATALOG_COLUMNS); w.writerows(rows)
+        return path
+    columns = list(zip(*rows)) if rows else [()] * len(CATALOG_COLUMNS)
+    table = pa.table({
+        "url": pa.array(columns[0], pa.string()),
+        "source": pa.array(columns[1], pa.string()).dictionary_encode(),
+        "lastmod": pa.array(columns[2], pa.string()),
+        "host": pa.array(columns[3], pa.string()).dictionary_encode(),
+    })
+    path = Path("catalog.parquet")
+    pq.write_table(table, path)
+    return path
+
+def file_hash(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""): h.update(chunk)
+    return h.hexdigest()
+
+def ingest_file(p: Path):
+    # roda dentro do worker: devolve {url: lastmod} do arquivo e o tempo gasto
+    t0 = time.perf_counter()
+    found = {}
+    for u, lastmod in extract_entries(p):
+        if u and (u not in found or lastmod): found[u] = lastmod
+    return p, found, time.perf_counter() - t0
+
+def ingest(files, workers: int):
+    results = {}
+    stats = []
+
+    def merge(p, found, secs):
+        results[p] = found
+        stats.append((p, len(found), secs))
+
+    if workers <= 1 or len(files) <= 1:
+        for p in files: merge(*ingest_file(p))
+        return results, stats
+    # maiores primeiro, pra o tempo total ficar perto do tempo do maior arquivo
+    files = sorted(files, key=lambda p: p.stat().st_size, reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for fut in as_completed([pool.submit(ingest_file, p) for p in files]):
+            merge(*fut.result())
+    return results, stats
+
+def load_manifest() -> dict:
+    if not MANIFEST.exists(): return {}
+    return json.loads(MANIFEST.read_text(encoding="utf-8")).get("files", {})
+
+def unchanged(p: Path, entry: dict):
+    # tamanho+mtime iguais dispensam o hash; senão compara o sha256
+    st = p.stat()
+    if entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime: return entry["sha256"]
+    digest = file_hash(p)
+    return digest if digest == entry.get("sha256") else None
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Unifica as URLs de todos os sitemaps da pasta")
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                    help="processos em paralelo (1 = sequencial)")
+    ap.add_argument("--incremental", action="store_true",
+                    help=f"só reprocessa sitemaps que mudaram desde o último {MANIFEST}")
+    args = ap.parse_args()
+
+    files = sorted(p for p in ROOT.rglob("*") if is_sitemap(p))
+    previous = load_manifest() if args.incremental else {}
+    manifest, reused, todo = {}, {}, []
+    for p in files:
+        entry = previous.get(str(p))
+        digest = unchanged(p, entry) if entry else None
+        if digest:
+            reused[p] = entry["urls"]
+            manifest[str(p)] = dict(entry, size=p.stat().st_size, mtime=p.stat().st_mtime)
+        else: todo.append(p)
+
+    t0 = time.perf_counter()
+    parsed, stats = ingest(todo, args.workers)
+    elapsed = time.perf_counter() - t0
+    for p, found in parsed.items():
+        st = p.stat()
+        manifest[str(p)] = {"sha256": file_hash(p), "size": st.st_size, "mtime": st.st_mtime, "urls": found}
 
-for p in ROOT.rglob("*"):
-    if p.is_file() and (p.suffix in [".xml"] or p.suffixes[-2:]==[".xml",".gz"] or p.suffix==".gz"):
-        for u in extract_urls_from_xml(read_xml_bytes(p)):
-            if u: urls.add(u)
+    for p, n, secs in sorted(stats, key=lambda s: s[2], reverse=True):
+        print(f"  {p}: {n} URLs em {secs*1000:.1f} ms")
 
-urls = sorted(urls)
-# TXT
-Path("all_urls.txt").write_text("\n".join(urls), encoding="utf-8")
-# CSV com uma coluna 'url'
-with open("all_urls.csv","w",newline="",encoding="utf-8") as f:
-    w=csv.writer(f); w.writerow(["url"]); w.writerows([[u] for u in urls])
+    sources = {**reused, **parsed}
+    urls = set()
+    for found in sources.values(): urls.update(found)
+    urls = sorted(urls)
+    # TXT
+    Path("all_urls.txt").write_text("\n".join(urls), encoding="utf-8")
+    # CSV com uma coluna 'url'
+    with open("all_urls.csv","w",newline="",encoding="utf-8") as f:
+        w=csv.writer(f); w.writerow(["url"]); w.writerows([[u] for u in urls])
+    # catálogo tipado: url, tipo do sitemap de origem, lastmod, host
+    catalog = write_catalog(build_catalog(sources))
+    # manifesto: hash de cada sitemap e o lastmod de cada URL, pra próxima rodada incremental
+    MANIFEST.write_text(json.dumps({"version": 1, "files": manifest}, indent=1), encoding="utf-8")
 
-print(f"OK! {len(urls)} URLs unificadas em all_urls.txt e all_urls.csv")
+    print(f"OK! {len(urls)} URLs unificadas em all_urls.txt, all_urls.csv e {catalog} ({len(todo)} sitemaps lidos, "
+          f"{len(reused)} reaproveitados, {elapsed:.2f}s, {args.workers} workers)")
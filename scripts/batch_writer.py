@@ -0,0 +1,92 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Shopify's redirect import columns
+HEADER = ('Redirect from', 'Redirect to')
+DEFAULT_BATCH_ROWS = 250
+
+def frame_rows(df):
+    """(from, to) rows of a path/target frame, without copying it"""
+    return zip(df['path'], df['target'])
+
+def encode_row(row):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator='\n').writerow(row)
+    return buf.getvalue().encode('utf-8')
+
+def manifest_name(pattern):
+    """'shopify_CORRECTED_batch_{n}.csv' -> 'shopify_CORRECTED_batch_manifest.json'"""
+    return os.path.splitext(pattern.format(n='manifest'))[0] + '.json'
+
+def _save(path, data, compress):
+    if compress:
+        # fixed mtime so identical batches give identical files and checksums
+        data = gzip.compress(data, mtime=0)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data), hashlib.sha256(data).hexdigest()
+
+def write_batches(rows, pattern, out_dir='.', max_rows=DEFAULT_BATCH_ROWS, max_bytes=None,
+                  compress=False, workers=1, manifest=True):
+    """Stream (from, to) rows into Shopify import CSVs, returning one manifest entry per file
+
+    `pattern` names batch n, e.g. 'shopify_batch_{n}_new.csv'. A batch is
+    closed when it reaches max_rows, or when the next row would push the
+    encoded file (header included) past max_bytes; a single row bigger
+    than that still gets a file of its own. Only the batch being filled
+    is held in memory, plus at most 2 x workers finished batches waiting
+    to be written. With compress the files get a .gz suffix; checksums
+    are of the bytes on disk. The manifest JSON lists every file with
+    its row count, size and sha256.
+    """
+    header = encode_row(HEADER)
+    entries = []
+    pending = []
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def flush(chunks, count):
+        n = len(entries) + 1
+        name = pattern.format(n=n) + ('.gz' if compress else '')
+        path = os.path.join(out_dir, name)
+        entry = {'file': name, 'rows': count}
+        entries.append(entry)
+        data = b''.join(chunks)
+        if pool is None:
+            entry['bytes'], entry['sha256'] = _save(path, data, compress)
+        else:
+            pending.append((entry, pool.submit(_save, path, data, compress)))
+            while len(pending) > 2 * workers:
+                done, future = pending.pop(0)
+                done['bytes'], done['sha256'] = future.result()
+        print(f"  Batch {n}: {count} redirects -> {path}")
+
+    try:
+        chunks, count, size = [header], 0, len(header)
+        for row in rows:
+            line = encode_row(row)
+            if count and (count >= max_rows or (max_bytes and size + len(line) > max_bytes)):
+                flush(chunks, count)
+                chunks, count, size = [header], 0, len(header)
+            chunks.append(line)
+            count += 1
+            size += len(line)
+        if count:
+            flush(chunks, count)
+        for entry, future in pending:
+            entry['bytes'], entry['sha256'] = future.result()
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if manifest:
+        path = os.path.join(out_dir, manifest_name(pattern))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'batches': entries, 'rows': sum(e['rows'] for e in entries),
+                       'max_rows': max_rows, 'max_bytes': max_bytes, 'gzip': compress}, f, indent=2)
+        print(f"  Manifest: {len(entries)} batches -> {path}")
+    return entries
@@ -0,0 +1,240 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from create_redirects_fast import index_new_urls, match_redirects
+from create_comprehensive_redirects import find_best_match
+from fix_blog_redirects_new import match_blog_redirects
+from create_final_redirects import apply_blog_overrides, apply_manual_fixes
+from fix_redirect_format import relativize_targets, write_corrected_batches
+from resolve_chains import collapse_chains
+from slug_index import SlugIndex
+from url_normalize import dedupe_redirects, unique_urls
+from url_records import default_cache, parse_url, tokenize
+
+REPO = Path(__file__).resolve().parent.parent
+DEFAULT_SIZES = [10_000, 100_000]
+# sitemaps.org caps a sitemap at 50k URLs, so big runs are split like a real site would be
+URLS_PER_SITEMAP = 50_000
+
+def load_extract():
+    """old/extract.py is a script, not a package module; load it by path"""
+    spec = importlib.util.spec_from_file_location('extract', REPO / 'old' / 'extract.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def url_shapes(urls):
+    """(scheme://host, path prefix before the slug, tokens in slug, trailing slash) per URL with a slug"""
+    shapes = []
+    for url in urls:
+        record = parse_url(url)
+        if not record.slug:
+            continue
+        prefix = record.path.rstrip('/')[:-len(record.slug)]
+        shapes.append((f"{record.scheme}://{record.host}", prefix, len(record.tokens) or 1,
+                       record.path.endswith('/')))
+    return shapes
+
+class SyntheticSite:
+    """Old/new URL sets at any scale, shaped like the real sitemaps
+
+    Path prefixes (/blogs/beauty/, /product/, /pa_size/...) and slug
+    lengths are sampled from old/all_urls.txt and new/all_urls.txt, slug
+    tokens from their combined token frequencies. Some old slugs reuse
+    a new slug verbatim or with an extra token, so the exact and partial
+    tiers see real work instead of everything falling through.
+    """
+
+    def __init__(self, seed=0, exact_share=0.25, partial_share=0.10):
+        real_old = (REPO / 'old' / 'all_urls.txt').read_text(encoding='utf-8').split()
+        real_new = (REPO / 'new' / 'all_urls.txt').read_text(encoding='utf-8').split()
+        self.old_shapes = url_shapes(real_old)
+        self.new_shapes = url_shapes(real_new)
+        self.new_ratio = len(real_new) / len(real_old)
+        self.tokens = [t for url in real_old + real_new for t in tokenize(parse_url(url).slug)]
+        self.seed = seed
+        self.exact_share = exact_share
+        self.partial_share = partial_share
+
+    def _slug(self, rng, n_tokens, uid):
+        return '-'.join(rng.choice(self.tokens) for _ in range(n_tokens)) + '-' + uid
+
+    @staticmethod
+    def _url(shape, slug):
+        host, prefix, _, slash = shape
+        return f"{host}{prefix}{slug}{'/' if slash else ''}"
+
+    def generate(self, n_old):
+        rng = random.Random(f"{self.seed}-{n_old}")
+        n_new = max(1, int(n_old * self.new_ratio))
+
+        new_slugs, new_urls = [], []
+        for i in range(n_new):
+            shape = rng.choice(self.new_shapes)
+            slug = self._slug(rng, shape[2], f"n{i:x}")
+            new_slugs.append(slug)
+            new_urls.append(self._url(shape, slug))
+
+        old_urls = []
+        for i in range(n_old):
+            shape = rng.choice(self.old_shapes)
+            roll = rng.random()
+            if roll < self.exact_share:
+                slug = rng.choice(new_slugs)
+            elif roll < self.exact_share + self.partial_share:
+                slug = f"{rng.choice(new_slugs)}-{rng.choice(self.tokens)}"
+            else:
+                slug = self._slug(rng, shape[2], f"o{i:x}")
+            old_urls.append(self._url(shape, slug))
+        return old_urls, new_urls
+
+def write_sitemaps(urls, out_dir):
+    """Split urls into sitemap XML files with a lastmod per entry"""
+    files = []
+    for n, start in enumerate(range(0, len(urls), URLS_PER_SITEMAP)):
+        path = Path(out_dir) / f"synthetic-sitemap{n + 1}.xml"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for url in urls[start:start + URLS_PER_SITEMAP]:
+                f.write(f"<url><loc>{url}</loc><lastmod>2024-01-01T00:00:00+00:00</lastmod></url>\n")
+            f.write('</urlset>\n')
+        files.append(path)
+    return files
+
+class StageTimer:
+    """Wall time, peak traced memory and row throughput per stage, stage output muted"""
+
+    def __init__(self, track_memory=True, verbose=False):
+        self.track_memory = track_memory
+        self.verbose = verbose
+        self.stages = {}
+
+    def run(self, name, rows, func, *args, **kwargs):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if self.verbose else out):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+        entry = {'seconds': round(seconds, 6), 'rows': rows,
+                 'rows_per_sec': round(rows / seconds, 1) if seconds else None}
+        if self.track_memory:
+            entry['peak_mb'] = round((tracemalloc.get_traced_memory()[1] - base) / 2**20, 3)
+        self.stages[name] = entry
+        memory = f", peak {entry['peak_mb']:.1f} MB" if self.track_memory else ''
+        print(f"  {name:<16} {seconds:8.3f}s  {rows:>9} rows{memory}")
+        return result
+
+def match_sample(func, old_urls, *args):
+    return [func(url, *args) for url in old_urls]
+
+def benchmark_scale(site, n_old, extract, work_dir, sample, track_memory=True, verbose=False):
+    old_urls, new_urls = site.generate(n_old)
+    print(f"\n=== {n_old} old / {len(new_urls)} new URLs ===")
+    # every scale starts with a cold URL cache, as a fresh run would
+    default_cache.clear()
+    timer = StageTimer(track_memory, verbose)
+
+    scale_dir = Path(work_dir) / str(n_old)
+    (scale_dir / 'batches').mkdir(parents=True)
+    files = write_sitemaps(old_urls, scale_dir)
+    found, _ = timer.run('extract', n_old, extract.ingest, files, 1)
+    assert set().union(*found.values()) == set(old_urls)
+
+    old_urls = timer.run('unique urls', n_old, unique_urls, old_urls)
+    timer.run('index', len(new_urls), index_new_urls, new_urls)
+    new_index = timer.run('slug index', len(new_urls), SlugIndex, new_urls)
+    main_df = timer.run('match', len(old_urls), match_redirects, old_urls, new_urls)
+
+    # the per-URL matchers are benchmarked on a fixed sample so big scales stay runnable
+    probe = random.Random(n_old).sample(old_urls, min(sample, n_old))
+    timer.run('find_best_match', len(probe), match_sample, find_best_match, probe, new_index)
+    blog_df = timer.run('blog match', len(probe), match_blog_redirects, probe, new_urls)
+
+    merged_df = timer.run('merge', len(main_df), apply_blog_overrides, main_df, blog_df)
+    final_df = timer.run('manual fixes', len(merged_df), apply_manual_fixes, merged_df)
+    corrected_df = timer.run('relativize', len(final_df), relativize_targets, final_df)
+    flat_df, _ = timer.run('resolve chains', len(corrected_df), collapse_chains, corrected_df)
+    normalized_df, _ = timer.run('normalize', len(flat_df), dedupe_redirects, flat_df[['path', 'target']])
+    timer.run('batch', len(normalized_df), write_corrected_batches, normalized_df,
+              out_dir=scale_dir / 'batches')
+
+    return {'scale': n_old, 'old_urls': n_old, 'new_urls': len(new_urls),
+            'sample': len(probe), 'stages': timer.stages}
+
+def compare(results, baseline_path, tolerance):
+    """Stages slower than `tolerance` x the baseline run at the same scale"""
+    baseline = {r['scale']: r['stages'] for r in json.loads(Path(baseline_path).read_text())['results']}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scale'], {})
+        for name, entry in result['stages'].items():
+            before = previous.get(name, {}).get('seconds')
+            if before and entry['seconds'] > before * tolerance:
+                regressions.append((result['scale'], name, before, entry['seconds']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every redirect pipeline stage on synthetic sitemaps")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="old-site URL counts to generate (e.g. 10000 100000 1000000)")
+    parser.add_argument('--sample', type=int, default=2000,
+                        help="old URLs fed to find_best_match / match_blog_redirects per scale")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='benchmark_results.json')
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc (faster, no peak_mb)")
+    parser.add_argument('--compare', default=None, help="previous results JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="flag stages slower than this factor of the --compare run")
+    parser.add_argument('-v', '--verbose', action='store_true', help="keep the stages' own progress output")
+    args = parser.parse_args()
+
+    site = SyntheticSite(args.seed)
+    extract = load_extract()
+    if not args.no_memory:
+        tracemalloc.start()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_old in args.sizes:
+            results.append(benchmark_scale(site, n_old, extract, work_dir, args.sample,
+                                           not args.no_memory, args.verbose))
+
+    report = {
+        'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'memory_tracked': not args.no_memory,
+        'results': results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"\nSaved results to: {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for scale, name, before, after in regressions:
+            print(f"  REGRESSION {scale}: {name} {before:.3f}s -> {after:.3f}s")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than {args.tolerance}x {args.compare}")
+
+if __name__ == "__main__":
+    main()
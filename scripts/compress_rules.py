@@ -0,0 +1,168 @@
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+from resolve_chains import DEFAULT_TABLES, REPO, load_redirect_tables
+from url_normalize import canonical_path, dedupe_redirects
+
+WILDCARD = '/*'
+
+def segments(path):
+    return [s for s in canonical_path(path).split('/') if s]
+
+class Node:
+    __slots__ = ('children', 'rows', 'targets', 'protected')
+
+    def __init__(self):
+        self.children = {}
+        self.rows = []            # (path, target) rows ending exactly here
+        self.targets = Counter()  # targets of every row in this subtree
+        self.protected = False    # a live page on the new store sits in this subtree
+
+class RuleTable:
+    """Exact rows first, then the longest matching prefix rule, like a proxy with wildcard redirects
+
+    A rule '/contest/*' matches '/contest' itself and every path below it,
+    on whole segments and compared by canonical path.
+    """
+
+    def __init__(self, rules, exact):
+        self.rules = {tuple(segments(prefix[:-len(WILDCARD)])): target for prefix, target in rules}
+        self.exact = {canonical_path(path): target for path, target in exact}
+
+    def lookup(self, path):
+        target = self.exact.get(canonical_path(path))
+        if target is not None:
+            return target
+        parts = segments(path)
+        for depth in range(len(parts), 0, -1):
+            target = self.rules.get(tuple(parts[:depth]))
+            if target is not None:
+                return target
+        return None
+
+def build_trie(rows, protected_paths):
+    root = Node()
+    for path, target in rows:
+        node = root
+        node.targets[target] += 1
+        for part in segments(path):
+            node = node.children.setdefault(part, Node())
+            node.targets[target] += 1
+        node.rows.append((path, target))
+    for path in protected_paths:
+        node = root
+        node.protected = True
+        for part in segments(path):
+            node = node.children.get(part)
+            if node is None:
+                break
+            node.protected = True
+    return root
+
+def compress(df, protected_paths=(), min_rows=5, max_exceptions=0.05):
+    """Replace subtrees whose rows (nearly) all share a target with one prefix rule
+
+    Walks the path trie top-down and stops at the first node that holds
+    at least min_rows redirects, no live page of the new store, and at
+    most max_exceptions of rows with another target; those exceptions
+    stay as exact rows, which take precedence over rules. The first row
+    per canonical path wins, as in the import. Returns (rules, exact)
+    lists of (from, to) pairs.
+    """
+    rows, seen = [], set()
+    for path, target in zip(df['path'], df['target']):
+        key = canonical_path(path)
+        if key not in seen:
+            seen.add(key)
+            rows.append((path, target))
+    root = build_trie(rows, protected_paths)
+
+    rules, exact = [], []
+
+    def subtree_rows(node):
+        yield from node.rows
+        for child in node.children.values():
+            yield from subtree_rows(child)
+
+    def walk(node, prefix):
+        total = sum(node.targets.values())
+        if prefix and not node.protected and total >= min_rows:
+            target, count = node.targets.most_common(1)[0]
+            if total - count <= max_exceptions * total:
+                rules.append(('/' + '/'.join(prefix) + WILDCARD, target))
+                exact.extend(row for row in subtree_rows(node) if row[1] != target)
+                return
+        exact.extend(node.rows)
+        for part, child in node.children.items():
+            walk(child, prefix + [part])
+
+    walk(root, [])
+    return rules, exact
+
+def check_equivalent(rows, rules, exact, protected_paths=()):
+    """Every original path still gets its target, and no live page is captured by a rule"""
+    table = RuleTable(rules, exact)
+    expected = {}
+    for path, target in rows:
+        expected.setdefault(canonical_path(path), target)
+    wrong = []
+    for path, target in expected.items():
+        got = table.lookup(path)
+        if got != target:
+            wrong.append((path, target, got))
+    captured = []
+    for path in protected_paths:
+        if canonical_path(path) in expected:
+            continue
+        got = table.lookup(path)
+        if got is not None:
+            captured.append((path, got))
+    return wrong, captured
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress redirect tables into prefix rules plus exact exceptions")
+    parser.add_argument('tables', nargs='*', help="redirect CSVs in priority order (default: the repo tables)")
+    parser.add_argument('--new-urls', default=REPO / 'new' / 'all_urls.txt',
+                        help="live store URLs that no rule may capture")
+    parser.add_argument('--min-rows', type=int, default=5, help="smallest subtree worth a rule")
+    parser.add_argument('--max-exceptions', type=float, default=0.05,
+                        help="share of a subtree that may keep a different target as exact rows")
+    parser.add_argument('--rules', default='redirect_rules.csv')
+    parser.add_argument('--exact', default='redirect_rules_exact.csv', help="rows the rules do not cover")
+    parser.add_argument('--expand', default=None,
+                        help="also write the full expanded table here, for importers without wildcard support")
+    args = parser.parse_args()
+
+    df = load_redirect_tables(args.tables or [REPO / name for name in DEFAULT_TABLES])
+    protected = [url for url in Path(args.new_urls).read_text(encoding='utf-8').split()]
+    rules, exact = compress(df, protected, args.min_rows, args.max_exceptions)
+
+    wrong, captured = check_equivalent(zip(df['path'], df['target']), rules, exact, protected)
+    print(f"Compressed {len(df)} redirects into {len(rules)} prefix rules + {len(exact)} exact rows")
+    print(f"Equivalence check: {len(wrong)} paths changed, {len(captured)} live pages captured")
+    for path, target, got in wrong[:10]:
+        print(f"  CHANGED {path}: {target} -> {got}")
+    for path, got in captured[:10]:
+        print(f"  CAPTURED {path} -> {got}")
+    if wrong or captured:
+        raise SystemExit("Rules are not equivalent to the table, nothing written")
+
+    header = ['Redirect from', 'Redirect to']
+    pd.DataFrame(rules, columns=header).to_csv(args.rules, index=False)
+    pd.DataFrame(exact, columns=header).to_csv(args.exact, index=False)
+    print(f"Saved rules to: {args.rules}")
+    print(f"Saved exact rows to: {args.exact}")
+    for prefix, target in sorted(rules, key=lambda rule: rule[0]):
+        print(f"  {prefix} -> {target}")
+
+    if args.expand:
+        # first row per canonical path, as the import and the rules see it
+        expanded, _ = dedupe_redirects(df[['path', 'target']])
+        expanded.to_csv(args.expand, index=False, header=header)
+        print(f"Saved expanded table to: {args.expand}")
+
+if __name__ == "__main__":
+    main()
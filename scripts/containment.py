@@ -0,0 +1,235 @@
+from bisect import bisect_right
+from collections import Counter, deque
+
+MODES = ('first', 'best', 'all')
+
+class AhoCorasick:
+    """Multi-pattern automaton: finds every pattern occurring inside a text in one pass"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [-1]        # pattern id ending exactly at this state
+        self.dict_link = [-1]  # nearest state on the fail chain that ends a pattern
+        self.min_out = [-1]    # smallest pattern id reachable through out/dict_link
+
+        for pid, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(-1)
+                    self.dict_link.append(-1)
+                    self.min_out.append(-1)
+                state = nxt
+            if self.out[state] == -1:
+                self.out[state] = pid
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(ch, 0)
+                self.fail[nxt] = f if f != nxt else 0
+                queue.append(nxt)
+            f = self.fail[state]
+            self.dict_link[state] = f if self.out[f] != -1 else self.dict_link[f]
+            own = self.out[state]
+            inherited = self.min_out[self.dict_link[state]] if self.dict_link[state] != -1 else -1
+            if own == -1 or (inherited != -1 and inherited < own):
+                own = inherited
+            self.min_out[state] = own
+
+    def _states(self, text):
+        goto, fail = self.goto, self.fail
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            yield state
+
+    def first(self, text):
+        """Smallest id of a pattern occurring in text, or -1"""
+        min_out = self.min_out
+        best = -1
+        for state in self._states(text):
+            m = min_out[state]
+            if m != -1 and (best == -1 or m < best):
+                best = m
+        return best
+
+    def find_all(self, text):
+        """Ids of every pattern occurring in text"""
+        out, dict_link = self.out, self.dict_link
+        found = set()
+        for state in self._states(text):
+            s = state if out[state] != -1 else dict_link[state]
+            while s != -1 and out[s] not in found:
+                found.add(out[s])
+                s = dict_link[s]
+        return found
+
+GRAM = 4
+
+def grams(text, q=GRAM):
+    return {text[i:i + q] for i in range(len(text) - q + 1)}
+
+class SlugText:
+    """Finds every pattern that contains a query
+
+    Queries of at least GRAM characters take the posting list (pattern
+    ids in order) of their rarest GRAM-gram and verify each candidate
+    with `in`. Shorter queries use str.find over all patterns joined by
+    NUL: a query never contains NUL, so a hit cannot straddle two
+    patterns and the leftmost hit lies in the earliest matching pattern.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.text = '\0'.join(self.patterns)
+        self.starts = []
+        self.postings = {}
+        offset = 0
+        for pid, pattern in enumerate(self.patterns):
+            self.starts.append(offset)
+            offset += len(pattern) + 1
+            for gram in grams(pattern):
+                self.postings.setdefault(gram, []).append(pid)
+
+    def _candidates(self, text):
+        """Ids that may contain text, in order, or None when only a full scan can tell"""
+        if len(text) < GRAM:
+            return None
+        lists = [self.postings.get(gram, ()) for gram in grams(text)]
+        return min(lists, key=len)
+
+    def _id(self, offset):
+        return bisect_right(self.starts, offset) - 1
+
+    def first(self, text):
+        """Smallest id of a pattern containing text, or -1"""
+        if not text:
+            return -1
+        candidates = self._candidates(text)
+        if candidates is not None:
+            return next((pid for pid in candidates if text in self.patterns[pid]), -1)
+        offset = self.text.find(text)
+        return -1 if offset == -1 else self._id(offset)
+
+    def find_all(self, text):
+        """Ids of every pattern containing text"""
+        found = set()
+        if not text:
+            return found
+        candidates = self._candidates(text)
+        if candidates is not None:
+            return {pid for pid in candidates if text in self.patterns[pid]}
+        offset = self.text.find(text)
+        while offset != -1:
+            pid = self._id(offset)
+            found.add(pid)
+            # resume at the next pattern: one hit per pattern is enough
+            nxt = self.starts[pid + 1] if pid + 1 < len(self.starts) else len(self.text)
+            offset = self.text.find(text, nxt)
+        return found
+
+class GramIndex:
+    """Finds every pattern occurring inside a query through an inverted index of GRAM-grams
+
+    Each pattern of at least GRAM characters is posted once, under its
+    rarest GRAM-gram and that gram's offset; every GRAM-gram of the query
+    looks up its postings and verifies each pattern in place with
+    str.startswith. Shorter patterns are looked up directly among the
+    query's short substrings.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.postings = {}
+        self.short = {}
+        unique = {}
+        for pid, pattern in enumerate(self.patterns):
+            # a repeated pattern reports its first id only, like AhoCorasick
+            if pattern and pattern not in unique:
+                unique[pattern] = pid
+        df = Counter(gram for pattern in unique for gram in grams(pattern))
+        for pattern, pid in unique.items():
+            if len(pattern) < GRAM:
+                self.short.setdefault(pattern, []).append(pid)
+                continue
+            offset = min(range(len(pattern) - GRAM + 1), key=lambda i: df[pattern[i:i + GRAM]])
+            self.postings.setdefault(pattern[offset:offset + GRAM], []).append((pid, offset))
+        self.short_lengths = sorted({len(p) for p in self.short})
+
+    def find_all(self, text):
+        """Ids of every pattern occurring in text"""
+        found = set()
+        patterns, postings, short = self.patterns, self.postings, self.short
+        for length in self.short_lengths:
+            for i in range(len(text) - length + 1):
+                ids = short.get(text[i:i + length])
+                if ids:
+                    found.update(ids)
+        for i in range(len(text) - GRAM + 1):
+            posted = postings.get(text[i:i + GRAM])
+            if posted:
+                found.update(pid for pid, offset in posted
+                             if offset <= i and text.startswith(patterns[pid], i - offset))
+        return found
+
+    def first(self, text):
+        """Smallest id of a pattern occurring in text, or -1"""
+        found = self.find_all(text)
+        return min(found) if found else -1
+
+class ContainmentMatcher:
+    """Partial slug matching: new slugs inside the old slug, or the old slug inside new slugs
+
+    Patterns keep their input order, so mode 'first' reproduces the old
+    "first dict entry wins" loop. Mode 'best' prefers the candidate whose
+    length is closest to the query (ties go to the earlier entry), and
+    'all' returns every candidate id in input order.
+    """
+
+    def __init__(self, slugs):
+        self.slugs = list(slugs)
+        self.inside = GramIndex(self.slugs)
+        self.around = SlugText(self.slugs)
+
+    def candidates(self, slug):
+        if not slug:
+            return []
+        return sorted(self.inside.find_all(slug) | self.around.find_all(slug))
+
+    def first(self, slug):
+        if not slug:
+            return -1
+        hits = [i for i in (self.inside.first(slug), self.around.first(slug)) if i != -1]
+        return min(hits) if hits else -1
+
+    def best(self, slug):
+        candidates = self.candidates(slug)
+        if not candidates:
+            return -1
+        return min(candidates, key=lambda i: (abs(len(self.slugs[i]) - len(slug)), i))
+
+    def match(self, slug, mode='first'):
+        """Candidate id(s) for slug: an int (-1 if none) for 'first'/'best', a list for 'all'"""
+        if mode == 'first':
+            return self.first(slug)
+        if mode == 'best':
+            return self.best(slug)
+        if mode == 'all':
+            return self.candidates(slug)
+        raise ValueError(f"Unknown match mode {mode!r}, expected one of {MODES}")
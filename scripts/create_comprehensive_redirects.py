@@ -1,92 +1,57 @@
+import argparse
 import pandas as pd
+from batch_writer import DEFAULT_BATCH_ROWS, frame_rows, write_batches
 import re
-from urllib.parse import urlparse
+from url_records import parse_url
 import os
+from slug_index import SlugIndex, index_for
+from url_categories import get_categorizer
+from instrumentation import add_metrics_argument, fallback_tier, metrics, save_metrics
+from url_normalize import unique_urls
+from match_cache import catalog_hash, default_cache
+
+# Bump when the matching logic changes so cached decisions are ignored
+MATCHER_VERSION = 1
 
 def extract_slug(url):
     """Extract the last part of URL path as slug"""
-    parsed = urlparse(url)
-    path = parsed.path.strip('/')
-    if path:
-        return path.split('/')[-1]
-    return ''
+    return parse_url(url).slug
 
 def extract_keywords(url):
     """Extract keywords for categorization"""
-    url_lower = url.lower()
-    
-    # Blog-related keywords
-    blog_keywords = [
-        'blog', 'tips', 'tutorial', 'guide', 'how-to', 'crossdressing', 
-        'transgender', 'feminization', 'makeup', 'beauty', 'stories', 
-        'community', 'experience', 'coming-out', 'gender'
-    ]
-    
-    # Product-related keywords
-    product_keywords = [
-        'breast-form', 'bra', 'wig', 'shoe', 'heel', 'lingerie', 'panty',
-        'adhesive', 'tape', 'size', 'color', 'brand', 'style', 'product'
-    ]
-    
-    # Check for blog keywords
-    for keyword in blog_keywords:
-        if keyword in url_lower:
-            return 'blog'
-    
-    # Check for product keywords
-    for keyword in product_keywords:
-        if keyword in url_lower:
-            return 'product'
-    
-    # Check URL structure patterns
-    if '/blog/' in url_lower or '/blogs/' in url_lower:
-        return 'blog'
-    elif any(x in url_lower for x in ['product', 'shop', 'store', 'brand', 'size']):
-        return 'product'
-    
-    return 'other'
+    return get_categorizer('comprehensive').classify(url)
 
-def find_best_match(old_url, new_urls):
-    """Find the best matching new URL for an old URL"""
-    old_slug = extract_slug(old_url)
-    old_category = extract_keywords(old_url)
-    
+def match_slug(old_slug, index):
+    """Exact, then partial slug match against a SlugIndex as (new_url, tier), or (None, None)"""
     # Direct slug matches
-    for new_url in new_urls:
-        new_slug = extract_slug(new_url)
-        if old_slug and new_slug and old_slug == new_slug:
-            return new_url
+    new_url = index.exact_match(old_slug)
+    if new_url:
+        return new_url, 'exact_slug'
     
     # Partial slug matches
-    if old_slug:
-        for new_url in new_urls:
-            new_slug = extract_slug(new_url)
-            if new_slug and (old_slug in new_slug or new_slug in old_slug):
-                return new_url
-    
-    # Category-based fallbacks
-    category_fallbacks = {
-        'blog': [
-            'https://tbfsna.myshopify.com/blogs/community-stories',
-            'https://tbfsna.myshopify.com/blogs/cd-tg-tips',
-            'https://tbfsna.myshopify.com/blogs/beauty',
-            'https://tbfsna.myshopify.com/blogs/breast-forms-breast-form-care'
-        ],
-        'product': [
-            'https://tbfsna.myshopify.com/collections/breast-forms',
-            'https://tbfsna.myshopify.com/collections/bras-and-lingerie',
-            'https://tbfsna.myshopify.com/collections/wigs',
-            'https://tbfsna.myshopify.com/collections/shoes-and-boots'
-        ]
-    }
-    
-    # Return category fallback
-    fallbacks = category_fallbacks.get(old_category, [])
-    if fallbacks:
-        return fallbacks[0]
-    
-    # Default fallback
-    return 'https://tbfsna.myshopify.com/'
+    new_url = index.partial_match(old_slug)
+    if new_url:
+        return new_url, 'partial_slug'
+    return None, None
+
+def find_best_match(old_url, new_urls, decision=None):
+    """Find the best matching new URL for an old URL
+    
+    `new_urls` may be a prebuilt SlugIndex or a plain list; a list is
+    indexed on first use and the index reused while the same list is
+    passed again, so the new side is only parsed once.
+    `decision` is a (new_url, tier) slug decision already known for this
+    URL's slug, e.g. from the match cache.
+    """
+    index = index_for(new_urls, extract_slug)
+    new_url, tier = decision or match_slug(extract_slug(old_url), index)
+    
+    # Category-based fallback, default homepage
+    if not new_url:
+        new_url = get_categorizer('comprehensive').targets[extract_keywords(old_url)]
+        tier = fallback_tier(new_url)
+    metrics.count('comprehensive', tier)
+    return new_url
 
 def create_redirects():
     """Create comprehensive redirect mapping"""
@@ -94,7 +59,7 @@ def create_redirects():
     
     # Load old URLs
     old_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\old\old.csv')
-    old_urls = old_df['url'].tolist()
+    old_urls = unique_urls(old_df['url'].tolist())
     
     # Load new URLs
     new_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\new\new.csv')
@@ -102,8 +67,25 @@ def create_redirects():
     
     print(f"Loaded {len(old_urls)} old URLs and {len(new_urls)} new URLs")
     
+    # Index new slugs once for all lookups
+    new_index = SlugIndex(new_urls, extract_slug)
+    
+    # Slug decisions from earlier runs against the same new URLs
+    cache = default_cache()
+    scope = f"comprehensive/v{MATCHER_VERSION}"
+    catalog = catalog_hash(new_urls)
+    old_slugs = [extract_slug(url) for url in old_urls if 'tbfsna.myshopify.com' not in url]
+    known = cache.get_many(scope, catalog, old_slugs) if cache is not None else {}
+    for slug in dict.fromkeys(old_slugs):
+        if slug not in known:
+            known[slug] = match_slug(slug, new_index)
+    if cache is not None:
+        cache.put_many(scope, catalog, [(slug, *decision) for slug, decision in known.items()])
+        cache.close()
+    
     # Create redirects
     redirects = []
+    matched = {}
     
     for i, old_url in enumerate(old_urls):
         if i % 500 == 0:
@@ -114,10 +96,10 @@ def create_redirects():
             continue
         
         # Find best match
-        new_url = find_best_match(old_url, new_urls)
+        new_url = matched[old_url] = find_best_match(old_url, new_index, known[extract_slug(old_url)])
         
         redirects.append({
-            'path': old_url.replace('https://thebreastformstore.com', ''),
+            'path': parse_url(old_url).relative,
             'target': new_url
         })
     
@@ -141,33 +123,22 @@ def create_redirects():
     print(f"\nSaved comprehensive redirects to: {output_file}")
     
     # Create batches for Shopify import (250 redirects per file)
-    batch_size = 250
-    total_batches = (len(redirects_df) + batch_size - 1) // batch_size
-    
-    print(f"\nCreating {total_batches} batch files...")
-    
-    for i in range(total_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(redirects_df))
-        batch_df = redirects_df.iloc[start_idx:end_idx]
-        
-        batch_filename = f'shopify_redirects_batch_{i+1}.csv'
-        batch_df.to_csv(batch_filename, index=False)
-        print(f"  Batch {i+1}: {len(batch_df)} redirects -> {batch_filename}")
+    print("\nCreating batch files...")
+    batches = write_batches(frame_rows(redirects_df), 'shopify_redirects_batch_{n}.csv')
     
     # Create summary statistics
     print(f"\n=== REDIRECT SUMMARY ===")
     print(f"Total old URLs processed: {len(old_urls)}")
     print(f"Total new URLs available: {len(new_urls)}")
     print(f"Total redirects created: {len(redirects_df)}")
-    print(f"Batch files created: {total_batches}")
-    print(f"Redirects per batch: {batch_size}")
+    print(f"Batch files created: {len(batches)}")
+    print(f"Redirects per batch: {DEFAULT_BATCH_ROWS}")
     
-    # Save detailed analysis
+    # Save detailed analysis, reusing the matches made above
     analysis_data = []
     for old_url in old_urls[:100]:  # Sample first 100 for detailed analysis
         if 'tbfsna.myshopify.com' not in old_url:
-            new_url = find_best_match(old_url, new_urls)
+            new_url = matched[old_url]
             category = extract_keywords(old_url)
             slug = extract_slug(old_url)
             
@@ -184,4 +155,9 @@ def create_redirects():
     print(f"\nSaved analysis sample to: redirect_analysis_sample.xlsx")
 
 if __name__ == "__main__":
-    create_redirects()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create comprehensive Shopify redirects with category fallbacks")
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    with metrics.stage('create_redirects'):
+        create_redirects()
+    save_metrics(args.metrics)
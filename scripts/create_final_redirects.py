@@ -1,87 +1,71 @@
 import pandas as pd
+from redirect_io import read_table, write_table
+from batch_writer import frame_rows, write_batches
+from url_normalize import canonical_key, canonical_keys
 import re
 
-def create_final_redirects():
-    """Create final comprehensive redirects with manual fixes"""
-    print("Creating final comprehensive redirects...")
+# Manual fixes for specific cases; paths are matched by canonical key, so one
+# entry covers its case and trailing-slash variants
+MANUAL_FIXES = {
+    '/crossdressing-101-how-to-walk-in-high-heels/': 'https://tbfsna.myshopify.com/blogs/community-stories/crossdressing-101-how-to-walk-in-high-heels',
+    '/tag/crossdressing-101-how-to-walk-in-high-heels/': 'https://tbfsna.myshopify.com/blogs/community-stories/crossdressing-101-how-to-walk-in-high-heels'
+}
+
+def apply_blog_overrides(main_df, blog_df):
+    """Combine redirects, prioritizing blog redirects for blog URLs
     
-    # Load the main redirect file
-    main_df = pd.read_excel('shopify_redirects_new.xlsx')
-    
-    # Load blog redirects
-    blog_df = pd.read_excel('blog_redirects_corrected.xlsx')
-    blog_redirects = blog_df[['path', 'target']].copy()
+    Blog rows come first, then an anti-join keeps only the main rows
+    whose path has no blog redirect.
+    """
+    blog_redirects = blog_df[['path', 'target']]
     
     print(f"Main redirects: {len(main_df)}")
     print(f"Blog redirects: {len(blog_redirects)}")
     
-    # Combine redirects, prioritizing blog redirects for blog URLs
-    final_redirects = []
-    blog_paths = set(blog_redirects['path'].tolist())
-    
-    # Add blog redirects first
-    for _, row in blog_redirects.iterrows():
-        final_redirects.append({
-            'path': row['path'],
-            'target': row['target']
-        })
-    
-    # Add non-blog redirects from main file
-    for _, row in main_df.iterrows():
-        if row['path'] not in blog_paths:
-            final_redirects.append({
-                'path': row['path'],
-                'target': row['target']
-            })
-    
-    # Add manual fixes for specific cases
-    manual_fixes = {
-        '/crossdressing-101-how-to-walk-in-high-heels/': 'https://tbfsna.myshopify.com/blogs/community-stories/crossdressing-101-how-to-walk-in-high-heels',
-        '/crossdressing-101-how-to-walk-in-high-heels': 'https://tbfsna.myshopify.com/blogs/community-stories/crossdressing-101-how-to-walk-in-high-heels',
-        '/tag/crossdressing-101-how-to-walk-in-high-heels/': 'https://tbfsna.myshopify.com/blogs/community-stories/crossdressing-101-how-to-walk-in-high-heels'
-    }
-    
-    # Apply manual fixes
-    existing_paths = {redirect['path'] for redirect in final_redirects}
-    for path, target in manual_fixes.items():
-        if path not in existing_paths:
-            final_redirects.append({
-                'path': path,
-                'target': target
-            })
-            print(f"Added manual fix: {path} -> {target}")
-    
-    # Convert to DataFrame
-    final_df = pd.DataFrame(final_redirects)
+    main_only = main_df.loc[~main_df['path'].isin(blog_redirects['path']), ['path', 'target']]
+    return pd.concat([blog_redirects, main_only], ignore_index=True)
+
+def apply_manual_fixes(df, manual_fixes=MANUAL_FIXES):
+    """Append manual fixes for paths not already redirected (in any equivalent spelling), then drop duplicate paths"""
+    existing = set(canonical_keys(df['path'].tolist()))
+    fixes = pd.DataFrame([(path, target) for path, target in manual_fixes.items()
+                          if canonical_key(path) not in existing],
+                         columns=['path', 'target'])
+    for path, target in zip(fixes['path'], fixes['target']):
+        print(f"Added manual fix: {path} -> {target}")
     
     # Remove duplicates, keeping first occurrence
+    final_df = pd.concat([df[['path', 'target']], fixes], ignore_index=True)
     final_df = final_df.drop_duplicates(subset=['path'], keep='first')
     
     print(f"Final redirects count: {len(final_df)}")
     
-    # Save comprehensive file
-    final_df.to_excel('shopify_redirects_FINAL.xlsx', index=False)
-    print("Saved final redirects to: shopify_redirects_FINAL.xlsx")
+    return final_df
+
+def create_final_redirects():
+    """Create final comprehensive redirects with manual fixes"""
+    print("Creating final comprehensive redirects...")
     
-    # Create final batches for Shopify import
-    batch_size = 250
-    total_batches = (len(final_df) + batch_size - 1) // batch_size
+    # Load the main redirect file
+    main_df = read_table('shopify_redirects_new')
     
-    print(f"Creating {total_batches} final batch files...")
+    # Load blog redirects
+    blog_df = read_table('blog_redirects_corrected')
+    
+    final_df = apply_manual_fixes(apply_blog_overrides(main_df, blog_df))
     
-    for i in range(total_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(final_df))
-        batch_df = final_df.iloc[start_idx:end_idx]
-        
-        batch_filename = f'shopify_FINAL_batch_{i+1}.csv'
-        batch_df.to_csv(batch_filename, index=False)
-        print(f"  Final Batch {i+1}: {len(batch_df)} redirects -> {batch_filename}")
+    # Save comprehensive file
+    output_file = write_table(final_df, 'shopify_redirects_FINAL')
+    print(f"Saved final redirects to: {output_file}")
+    
+    # Create final batches for Shopify import
+    print("Creating final batch files...")
+    batches = write_batches(frame_rows(final_df), 'shopify_FINAL_batch_{n}.csv')
     
     # Show statistics
     print(f"\n=== FINAL REDIRECT SUMMARY ===")
     print(f"Total final redirects: {len(final_df)}")
-    print(f"Final batch files: {total_batches}")
+    print(f"Final batch files: {len(batches)}")
     
     print(f"\nTop redirect targets:")
     target_counts = final_df['target'].value_counts()
@@ -96,8 +80,9 @@ def create_final_redirects():
     ]
     
     print(f"\nTest cases:")
+    keys = canonical_keys(final_df['path'].tolist())
     for test_path in test_paths:
-        match = final_df[final_df['path'] == test_path]
+        match = final_df[keys == canonical_key(test_path)]
         if not match.empty:
             print(f"  {test_path} -> {match.iloc[0]['target']}")
         else:
@@ -1,67 +1,120 @@
+import argparse
 import pandas as pd
+from redirect_io import write_table
+from batch_writer import frame_rows, write_batches
 import re
-from urllib.parse import urlparse
+from url_records import parse_url
 import os
+from containment import ContainmentMatcher
+from fuzzy_match import FuzzyIndex, ratio_for
+from url_categories import get_categorizer
+from instrumentation import add_metrics_argument, fallback_tier, metrics, save_metrics
+from url_normalize import unique_urls
+from url_catalog import COMPARABLE, comparable_group
+from match_cache import catalog_hash, default_cache
+
+# Bump when the matching logic changes so saved state and cached decisions are ignored
+MATCHER_VERSION = 3
+
+# Edit-distance matches below this confidence (1 - edits / slug length) fall
+# through to the category fallback; 0.9 keeps typos and reordered words but
+# not different verbs ('how-to-wear-...' vs 'how-to-attach-...')
+FUZZY_MIN_CONFIDENCE = 0.9
 
 def extract_slug(url):
     """Extract the last part of URL path as slug"""
-    try:
-        parsed = urlparse(url)
-        path = parsed.path.strip('/')
-        if path:
-            return path.split('/')[-1]
-        return ''
-    except:
-        return ''
+    return parse_url(url).slug
 
 def categorize_url(url):
     """Quick categorization of URLs"""
-    url_lower = url.lower()
-    
-    if '/blog' in url_lower or 'crossdressing' in url_lower or 'tutorial' in url_lower:
-        return 'blog'
-    elif any(x in url_lower for x in ['breast-form', 'bra', 'wig', 'product', 'brand', 'size']):
-        return 'product'
-    else:
-        return 'other'
+    return get_categorizer('fast').classify(url)
 
-def create_redirects_optimized():
-    """Create redirects with optimized performance"""
-    print("Loading CSV files...")
-    
-    # Load old URLs
-    old_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\old\old.csv')
-    old_urls = old_df['url'].tolist()
-    
-    # Load new URLs
-    new_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\new\new.csv')
-    new_urls = new_df['url'].tolist()
-    
-    print(f"Loaded {len(old_urls)} old URLs and {len(new_urls)} new URLs")
+def index_new_urls(new_urls, fuzzy_min=FUZZY_MIN_CONFIDENCE):
+    """Slug lookups over the new URLs: slug -> URL dict, its key order, containment and fuzzy engines
     
+    The fuzzy engine only searches as many edits as a fuzzy_min match can have.
+    """
     # Pre-process new URLs for faster lookup
     new_slugs = {}
-    blog_urls = []
-    product_urls = []
     
     for url in new_urls:
         slug = extract_slug(url)
         if slug:
             new_slugs[slug] = url
-        
-        if '/blogs/' in url:
-            blog_urls.append(url)
-        elif '/collections/' in url or '/products/' in url:
-            product_urls.append(url)
     
     print(f"Indexed {len(new_slugs)} new URL slugs")
     
-    # Define fallback URLs
-    fallback_urls = {
-        'blog': 'https://tbfsna.myshopify.com/blogs/community-stories',
-        'product': 'https://tbfsna.myshopify.com/collections/breast-forms',
-        'other': 'https://tbfsna.myshopify.com/'
-    }
+    # Containment engine over the slugs, in dict order
+    slug_list = list(new_slugs)
+    containment = ContainmentMatcher(slug_list)
+    fuzzy = FuzzyIndex(slug_list, max_ratio=ratio_for(fuzzy_min))
+    
+    return new_slugs, slug_list, containment, fuzzy
+
+def index_typed_urls(new_urls, new_types, fuzzy_min=FUZZY_MIN_CONFIDENCE):
+    """index_new_urls() over each group of comparable source types in url_catalog.COMPARABLE"""
+    typed = {}
+    for group in set(COMPARABLE.values()):
+        print(f"Indexing new {'/'.join(group) or 'nothing'}:")
+        typed[group] = index_new_urls([url for url in new_urls if new_types.get(url) in group], fuzzy_min)
+    return typed
+
+def index_fingerprint(index):
+    """catalog_hash() of the slug -> URL entries an index_new_urls() index matches against"""
+    new_slugs, slug_list, _, _ = index
+    return catalog_hash(f"{slug}\t{new_slugs[slug]}" for slug in slug_list)
+
+def match_slug(old_slug, index, partial_mode='first', fuzzy_min=FUZZY_MIN_CONFIDENCE):
+    """Exact, partial, then fuzzy slug match as (new_url, tier), or (None, None)"""
+    new_slugs, slug_list, containment, fuzzy = index
+    if not old_slug:
+        return None, None
+    
+    # Try direct slug match first
+    if old_slug in new_slugs:
+        return new_slugs[old_slug], 'exact_slug'
+    
+    # Try partial matches
+    match_id = containment.match(old_slug, partial_mode)
+    if match_id != -1:
+        return new_slugs[slug_list[match_id]], 'partial_slug'
+    
+    # Near misses (typos, reordered words) by bounded edit distance
+    match_id, _, confidence = fuzzy.match(old_slug)
+    if match_id != -1 and confidence >= fuzzy_min:
+        return new_slugs[slug_list[match_id]], 'fuzzy'
+    return None, None
+
+def match_old_urls(old_urls, index, partial_mode='first', fuzzy_min=FUZZY_MIN_CONFIDENCE,
+                   old_types=None, typed=None, cache=None):
+    """Match each old URL against an index_new_urls() index, returning (old_url, path, target) rows
+    
+    With old_types (url -> catalog source type) and typed (index_typed_urls()),
+    an old URL is only compared against new URLs of a comparable type;
+    untyped URLs use `index`. With cache (a match_cache.MatchCache), slug
+    decisions made by earlier runs against the same candidates are reused
+    and new ones are stored.
+    """
+    
+    # Categorize all old URLs in one pass; fallbacks come from the rule table
+    categorizer = get_categorizer('fast')
+    categories = categorizer.classify_many(old_urls)
+    fallback_urls = categorizer.targets
+    
+    def group_of(old_url):
+        return comparable_group(old_url, old_types) if typed else None
+    
+    # Load every cached decision up front, one bulk read per index
+    scope = f"fast/v{MATCHER_VERSION}/{partial_mode}/{fuzzy_min}"
+    catalogs, known, fresh = {}, {}, {}
+    if cache is not None:
+        slugs_by_group = {}
+        for old_url in old_urls:
+            if 'tbfsna.myshopify.com' not in old_url:
+                slugs_by_group.setdefault(group_of(old_url), []).append(extract_slug(old_url))
+        for group, slugs in slugs_by_group.items():
+            catalogs[group] = index_fingerprint(index if group is None else typed[group])
+            known[group] = cache.get_many(scope, catalogs[group], slugs)
     
     # Create redirects
     redirects = []
@@ -75,65 +128,91 @@ def create_redirects_optimized():
             continue
         
         # Extract path for redirect
-        path = old_url.replace('https://thebreastformstore.com', '')
+        path = parse_url(old_url).relative
         old_slug = extract_slug(old_url)
-        category = categorize_url(old_url)
+        category = categories[i]
+        group = group_of(old_url)
         
         # Find matching new URL
-        new_url = None
-        
-        # Try direct slug match first
-        if old_slug and old_slug in new_slugs:
-            new_url = new_slugs[old_slug]
-        else:
-            # Try partial matches
-            if old_slug:
-                for new_slug, url in new_slugs.items():
-                    if old_slug in new_slug or new_slug in old_slug:
-                        new_url = url
-                        break
+        decision = known[group].get(old_slug) if cache is not None else None
+        if decision is None:
+            decision = match_slug(old_slug, index if group is None else typed[group], partial_mode, fuzzy_min)
+            if cache is not None and old_slug:
+                fresh.setdefault(group, []).append((old_slug, *decision))
+        new_url, tier = decision
         
         # Use fallback if no match found
         if not new_url:
             new_url = fallback_urls[category]
+            tier = fallback_tier(new_url)
         
-        redirects.append({
-            'path': path,
-            'target': new_url
-        })
+        metrics.count('fast', tier)
+        redirects.append((old_url, path, new_url))
     
-    # Convert to DataFrame
-    redirects_df = pd.DataFrame(redirects)
+    for group, decisions in fresh.items():
+        cache.put_many(scope, catalogs[group], decisions)
+    
+    return redirects
+
+def redirects_frame(rows):
+    """path/target frame from (old_url, path, target) rows, first row per path wins"""
+    redirects_df = pd.DataFrame([(path, target) for _, path, target in rows], columns=['path', 'target'])
     
     # Remove duplicates
     redirects_df = redirects_df.drop_duplicates(subset=['path'])
     
     print(f"Created {len(redirects_df)} unique redirects")
     
+    return redirects_df
+
+def match_redirects(old_urls, new_urls, partial_mode='first', fuzzy_min=FUZZY_MIN_CONFIDENCE,
+                    old_types=None, new_types=None, cache=None):
+    """Match old URLs to new URLs, returning a deduplicated path/target frame
+    
+    partial_mode picks among partial slug matches: 'first' keeps the
+    original first-dict-entry behaviour, 'best' takes the closest length.
+    fuzzy_min is the confidence an edit-distance match needs (above 1 disables it).
+    old_types/new_types (url -> source type from the extract.py catalogs)
+    restrict each old URL to new URLs of a comparable type. cache is an
+    optional match_cache.MatchCache shared with earlier runs.
+    """
+    index = index_new_urls(new_urls, fuzzy_min)
+    typed = index_typed_urls(new_urls, new_types, fuzzy_min) if old_types and new_types else None
+    return redirects_frame(match_old_urls(old_urls, index, partial_mode, fuzzy_min, old_types, typed, cache))
+
+def create_redirects_optimized(partial_mode='first'):
+    """Create redirects with optimized performance"""
+    print("Loading CSV files...")
+    
+    # Load old URLs
+    old_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\old\old.csv')
+    old_urls = unique_urls(old_df['url'].tolist())
+    
+    # Load new URLs
+    new_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\new\new.csv')
+    new_urls = new_df['url'].tolist()
+    
+    print(f"Loaded {len(old_urls)} old URLs and {len(new_urls)} new URLs")
+    
+    cache = default_cache()
+    try:
+        redirects_df = match_redirects(old_urls, new_urls, partial_mode, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    
     # Save main file
-    output_file = 'shopify_redirects_new.xlsx'
-    redirects_df.to_excel(output_file, index=False)
+    output_file = write_table(redirects_df, 'shopify_redirects_new')
     print(f"Saved redirects to: {output_file}")
     
     # Create batches for Shopify import (250 redirects per file)
-    batch_size = 250
-    total_batches = (len(redirects_df) + batch_size - 1) // batch_size
-    
-    print(f"Creating {total_batches} batch files...")
-    
-    for i in range(total_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(redirects_df))
-        batch_df = redirects_df.iloc[start_idx:end_idx]
-        
-        batch_filename = f'shopify_batch_{i+1}_new.csv'
-        batch_df.to_csv(batch_filename, index=False)
-        print(f"  Batch {i+1}: {len(batch_df)} redirects -> {batch_filename}")
+    print("Creating batch files...")
+    batches = write_batches(frame_rows(redirects_df), 'shopify_batch_{n}_new.csv')
     
     # Analyze redirect distribution
     print(f"\n=== REDIRECT SUMMARY ===")
     print(f"Total redirects created: {len(redirects_df)}")
-    print(f"Batch files created: {total_batches}")
+    print(f"Batch files created: {len(batches)}")
     
     print("\nTop redirect targets:")
     target_counts = redirects_df['target'].value_counts()
@@ -143,4 +222,9 @@ def create_redirects_optimized():
     return redirects_df
 
 if __name__ == "__main__":
-    create_redirects_optimized()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create Shopify redirects from the old and new sitemap CSVs")
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    with metrics.stage('create_redirects_optimized'):
+        create_redirects_optimized()
+    save_metrics(args.metrics)
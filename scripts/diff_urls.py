@@ -0,0 +1,188 @@
+import argparse
+import csv
+import heapq
+import itertools
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from url_catalog import CATEGORIES, find_catalog, iter_sources
+from url_categories import get_categorizer
+from url_normalize import canonical_path
+
+REPO = Path(__file__).resolve().parent.parent
+RUN_SIZE = 200_000
+KINDS = ('only_in_old', 'only_in_new', 'matched')
+
+def slug_key(url):
+    """Normalized slug (last canonical path segment) without going through the URL cache"""
+    return canonical_path(url).rsplit('/', 1)[-1]
+
+def read_urls(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            url = line.strip()
+            if url:
+                yield url
+
+def external_sort(records, work_dir, run_size=RUN_SIZE):
+    """Sort tuples of tab-free strings with at most run_size in memory: sorted runs on disk, then a k-way merge"""
+    runs = []
+    while True:
+        chunk = sorted(itertools.islice(records, run_size))
+        if not chunk:
+            break
+        if len(chunk) < run_size and not runs:
+            # everything fit in one run: no temp file needed
+            yield from chunk
+            return
+        fd, run_path = tempfile.mkstemp(suffix='.run', dir=work_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines('\t'.join(record) + '\n' for record in chunk)
+        runs.append(run_path)
+        if len(chunk) < run_size:
+            break
+
+    def read_run(run_path):
+        with open(run_path, encoding='utf-8') as f:
+            for line in f:
+                yield tuple(line.rstrip('\n').split('\t'))
+
+    try:
+        yield from heapq.merge(*(read_run(run) for run in runs))
+    finally:
+        for run in runs:
+            os.remove(run)
+
+def catalog_categories(urls, catalog, work_dir, run_size=RUN_SIZE):
+    """(url, category) for each URL, category '' when the catalog does not list it
+
+    Both the URL list and the catalog are externally sorted by URL and
+    merge-joined, so neither side is ever held in memory whole.
+    """
+    sorted_urls = external_sort(((url,) for url in urls), work_dir, run_size)
+    sorted_catalog = external_sort(((url, CATEGORIES.get(source, 'other')) for url, source in iter_sources(catalog)),
+                                   work_dir, run_size)
+    entry = next(sorted_catalog, None)
+    for (url,) in sorted_urls:
+        while entry is not None and entry[0] < url:
+            entry = next(sorted_catalog, None)
+        yield url, entry[1] if entry is not None and entry[0] == url else ''
+
+def keyed(rows):
+    """(slug, category, url) records; the catalog's category when it has one, else a guess from the path"""
+    categorizer = get_categorizer('catalog')
+    for url, category in rows:
+        yield slug_key(url), category or categorizer.classify(url), url
+
+def sort_by_slug(path, work_dir, run_size=RUN_SIZE, catalog=None):
+    """URL list sorted by (slug, category, url) in bounded memory, categorized from `catalog` if given
+
+    all_urls.txt is sorted by URL, not by slug, so each side is re-sorted
+    here; at most run_size records are in memory at once.
+    """
+    urls = read_urls(path)
+    rows = catalog_categories(urls, catalog, work_dir, run_size) if catalog else ((url, '') for url in urls)
+    return external_sort(keyed(rows), work_dir, run_size)
+
+def merge_diff(old_sorted, new_sorted):
+    """One pass over both slug-sorted streams, yielding (kind, category, slug, old_url, new_url)
+
+    URLs sharing a slug are grouped; each old URL of a matched slug is
+    paired with the first new URL of that slug, and the slug's other new
+    URLs are reported as only_in_new.
+    """
+    old_groups = itertools.groupby(old_sorted, key=lambda r: r[0])
+    new_groups = itertools.groupby(new_sorted, key=lambda r: r[0])
+    old_item = next(old_groups, None)
+    new_item = next(new_groups, None)
+    while old_item or new_item:
+        if new_item is None or (old_item and old_item[0] < new_item[0]):
+            for key, category, url in old_item[1]:
+                yield 'only_in_old', category, key, url, None
+            old_item = next(old_groups, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            for key, category, url in new_item[1]:
+                yield 'only_in_new', category, key, None, url
+            new_item = next(new_groups, None)
+        else:
+            new_rows = new_item[1]
+            first_new = next(new_rows)[2]
+            for key, category, url in old_item[1]:
+                yield 'matched', category, key, url, first_new
+            # further new URLs with the slug have no old counterpart of their own
+            for key, category, url in new_rows:
+                yield 'only_in_new', category, key, None, url
+            old_item = next(old_groups, None)
+            new_item = next(new_groups, None)
+
+class DiffWriter:
+    """One CSV per (category, kind), opened on first use"""
+
+    def __init__(self, out_dir):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.files = {}
+        self.counts = Counter()
+
+    def write(self, kind, category, slug, old_url, new_url):
+        key = (category, kind)
+        if key not in self.files:
+            f = open(self.out_dir / f"{category}_{kind}.csv", 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(['slug', 'old_url', 'new_url'] if kind == 'matched' else ['slug', 'url'])
+            self.files[key] = (f, writer)
+        writer = self.files[key][1]
+        if kind == 'matched':
+            writer.writerow([slug, old_url, new_url])
+        else:
+            writer.writerow([slug, old_url or new_url])
+        self.counts[key] += 1
+
+    def close(self):
+        for f, _ in self.files.values():
+            f.close()
+
+def diff_urls(old_path, new_path, out_dir, run_size=RUN_SIZE, old_catalog=None, new_catalog=None):
+    """Diff two URL lists by normalized slug into per-category CSVs, returning the counts
+
+    With old_catalog/new_catalog (extract.py catalogs), a URL's category
+    comes from the sitemap it was listed in instead of its path; the
+    catalog is merge-joined in sorted runs like the lists themselves.
+    """
+    writer = DiffWriter(out_dir)
+    with tempfile.TemporaryDirectory(dir=out_dir) as work_dir:
+        try:
+            for row in merge_diff(sort_by_slug(old_path, work_dir, run_size, old_catalog),
+                                  sort_by_slug(new_path, work_dir, run_size, new_catalog)):
+                writer.write(*row)
+        finally:
+            writer.close()
+    return writer.counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff old vs new URL lists by normalized slug, per category")
+    parser.add_argument('--old', default=REPO / 'old' / 'all_urls.txt')
+    parser.add_argument('--new', default=REPO / 'new' / 'all_urls.txt')
+    parser.add_argument('--out-dir', default='url_diff')
+    parser.add_argument('--run-size', type=int, default=RUN_SIZE,
+                        help="URLs per in-memory sort run (bounds memory)")
+    parser.add_argument('--old-catalog', default=None,
+                        help="extract.py catalog for the old URLs (default: catalog.parquet/.csv next to --old)")
+    parser.add_argument('--new-catalog', default=None,
+                        help="extract.py catalog for the new URLs (default: catalog.parquet/.csv next to --new)")
+    args = parser.parse_args()
+
+    old_catalog = args.old_catalog or find_catalog(Path(args.old).parent)
+    new_catalog = args.new_catalog or find_catalog(Path(args.new).parent)
+    counts = diff_urls(args.old, args.new, args.out_dir, args.run_size, old_catalog, new_catalog)
+
+    print(f"\n=== URL DIFF ({args.out_dir}) ===")
+    categories = sorted({category for category, _ in counts})
+    print(f"  {'category':<12}" + ''.join(f"{kind:>13}" for kind in KINDS))
+    for category in categories:
+        print(f"  {category:<12}" + ''.join(f"{counts[(category, kind)]:>13}" for kind in KINDS))
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,150 @@
+import argparse
 import pandas as pd
+from redirect_io import write_table
+from batch_writer import frame_rows, write_batches
 import re
-from urllib.parse import urlparse
+from url_records import parse_url
+from keyword_scoring import KeywordScorer
+from minhash_lsh import MinHashLSH
+from url_categories import get_categorizer
+from instrumentation import add_metrics_argument, fallback_tier, metrics, save_metrics
+from url_normalize import unique_urls
+from url_catalog import BLOG_SOURCES
+from match_cache import catalog_hash, default_cache
+from slug_index import index_for
+
+# Bump when the matching logic changes so cached decisions are ignored
+MATCHER_VERSION = 2
+
+# BM25 score a keyword match must exceed; one shared generic token
+# ('crossdressing', 'and', 'the') scores below this on the current catalog
+KEYWORD_MIN_SCORE = 3.0
+
+# Token-set Jaccard around which the approximate tier shortlists a blog post
+# (32 bands x 2 rows); raise it for shorter shortlists at the cost of recall
+LSH_THRESHOLD = 0.2
 
 def extract_slug_from_url(url):
     """Extract meaningful slug from URL"""
-    try:
-        parsed = urlparse(url)
-        path = parsed.path.strip('/')
-        if path:
-            # Get the last meaningful part
-            parts = path.split('/')
-            return parts[-1] if parts[-1] else (parts[-2] if len(parts) > 1 else '')
-        return ''
-    except:
-        return ''
+    return parse_url(url).slug
 
 def is_blog_url(url):
     """Check if URL is blog-related"""
-    blog_indicators = [
-        '/blog/', 'crossdressing', 'tutorial', 'tips', 'guide', 'how-to',
-        'transgender', 'feminization', 'makeup', 'beauty', 'story', 'experience'
-    ]
-    url_lower = url.lower()
-    return any(indicator in url_lower for indicator in blog_indicators)
+    return get_categorizer('blog').classify(url) == 'blog'
 
-def find_blog_match(old_url, blog_urls):
-    """Find best matching blog URL"""
+def blog_match_tier(old_url, blog_urls, scorer=None, min_score=KEYWORD_MIN_SCORE, lsh=None):
+    """find_blog_match() as (blog_url, tier), or (None, None), without counting metrics"""
     old_slug = extract_slug_from_url(old_url)
     
     if not old_slug:
-        return None
-    
-    # Direct matches
-    for blog_url in blog_urls:
-        blog_slug = extract_slug_from_url(blog_url)
-        if old_slug == blog_slug:
-            return blog_url
-    
-    # Partial matches
-    for blog_url in blog_urls:
-        blog_slug = extract_slug_from_url(blog_url)
-        if old_slug in blog_slug or blog_slug in old_slug:
-            return blog_url
-    
-    # Keyword matches
-    old_keywords = re.findall(r'\b\w+\b', old_slug.replace('-', ' '))
-    best_match = None
-    best_score = 0
-    
-    for blog_url in blog_urls:
-        blog_slug = extract_slug_from_url(blog_url)
-        blog_keywords = re.findall(r'\b\w+\b', blog_slug.replace('-', ' '))
-        
-        # Count matching keywords
-        matches = len(set(old_keywords) & set(blog_keywords))
-        if matches > best_score:
-            best_score = matches
-            best_match = blog_url
-    
-    return best_match if best_score > 0 else None
+        return None, None
+    
+    # Direct and partial matches through the slug index, built once per blog_urls list
+    index = index_for(blog_urls, extract_slug_from_url)
+    blog_url = index.exact_match(old_slug)
+    if blog_url:
+        return blog_url, 'exact_slug'
+    blog_url = index.partial_match(old_slug)
+    if blog_url:
+        return blog_url, 'partial_slug'
+    
+    # Keyword matches, BM25-weighted so generic tokens count for little
+    if scorer is None:
+        scorer = KeywordScorer(index.slugs)
+    if lsh is not None:
+        # Approximate tier for big catalogs: exact BM25 over the LSH shortlist only
+        best = scorer.best_among(old_slug, lsh.candidates(old_slug), min_score)
+        tier = 'lsh'
+    else:
+        best = scorer.best(old_slug, min_score)
+        tier = 'keyword'
+    if best == -1:
+        return None, None
+    return index.urls[best], tier
 
-def create_blog_redirects():
-    """Create corrected blog redirects"""
-    print("Loading data...")
-    
-    # Load old URLs
-    old_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\old\old.csv')
-    old_urls = old_df['url'].tolist()
-    
-    # Load new URLs
-    new_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\new\new.csv')
-    new_urls = new_df['url'].tolist()
-    
+def find_blog_match(old_url, blog_urls, scorer=None, min_score=KEYWORD_MIN_SCORE, lsh=None):
+    """Find best matching blog URL
+    
+    `scorer` is a KeywordScorer over the blog slugs; build it once (and
+    prime it with all old slugs) when matching many URLs. With `lsh`, a
+    MinHashLSH over the same slugs, only its shortlist is keyword-scored.
+    """
+    blog_url, tier = blog_match_tier(old_url, blog_urls, scorer, min_score, lsh)
+    if blog_url:
+        metrics.count('blog', tier)
+    return blog_url
+
+def match_blog_redirects(old_urls, new_urls, approximate=False, old_types=None, new_types=None, cache=None):
+    """Match old blog posts to new blog URLs, returning path/target/old_url/matched rows
+    
+    approximate swaps full keyword scoring for a MinHash/LSH shortlist
+    that is then scored exactly, for catalogs too big to score every pair.
+    With old_types/new_types from the extract.py catalogs, posts are the
+    URLs from blog sitemaps instead of keyword guesses. cache is an
+    optional match_cache.MatchCache: slugs decided by an earlier run
+    against the same blog URLs are not scored again.
+    """
     # Filter blog URLs from new site
-    blog_urls = [url for url in new_urls if '/blogs/' in url]
+    if new_types:
+        blog_urls = [url for url in new_urls if new_types.get(url) == 'post']
+    else:
+        blog_urls = [url for url in new_urls if '/blogs/' in url]
     print(f"Found {len(blog_urls)} blog URLs in new site")
     
     # Find blog URLs from old site
-    old_blog_urls = [url for url in old_urls if is_blog_url(url)]
+    if old_types:
+        untyped = [url for url in old_urls if url not in old_types]
+        keyword_blog = {url for url, category in zip(untyped, get_categorizer('blog').classify_many(untyped))
+                        if category == 'blog'}
+        old_blog_urls = [url for url in old_urls if old_types.get(url) in BLOG_SOURCES or url in keyword_blog]
+    else:
+        old_categories = get_categorizer('blog').classify_many(old_urls)
+        old_blog_urls = [url for url, category in zip(old_urls, old_categories) if category == 'blog']
     print(f"Found {len(old_blog_urls)} blog URLs in old site")
     
+    # Decisions from earlier runs against the same blog URLs and settings
+    old_slugs = [extract_slug_from_url(url) for url in old_blog_urls]
+    scope = f"blog/v{MATCHER_VERSION}/{KEYWORD_MIN_SCORE}" + (f"/lsh{LSH_THRESHOLD}" if approximate else '')
+    catalog = catalog_hash(blog_urls)
+    known = cache.get_many(scope, catalog, old_slugs) if cache is not None else {}
+    fresh = {}
+    
+    # Score every remaining old slug against the blog slugs in one batch
+    blog_slugs = index_for(blog_urls, extract_slug_from_url).slugs
+    old_slugs = [slug for slug in old_slugs if slug not in known]
+    scorer = KeywordScorer(blog_slugs)
+    lsh = None
+    if approximate:
+        lsh = MinHashLSH(blog_slugs, threshold=LSH_THRESHOLD)
+        lsh.prime(old_slugs)
+    else:
+        scorer.prime(old_slugs)
+    
     # Create blog redirects
+    fallback_blogs = get_categorizer('blog_fallback')
     blog_redirects = []
     matched_count = 0
     
     for old_url in old_blog_urls:
-        path = old_url.replace('https://thebreastformstore.com', '')
+        path = parse_url(old_url).relative
         
         # Find best match
-        best_match = find_blog_match(old_url, blog_urls)
+        old_slug = extract_slug_from_url(old_url)
+        decision = known.get(old_slug) or fresh.get(old_slug)
+        if decision is None:
+            decision = blog_match_tier(old_url, blog_urls, scorer, lsh=lsh)
+            if old_slug:
+                fresh[old_slug] = decision
+        best_match, tier = decision
         
         if best_match:
             matched_count += 1
+            metrics.count('blog', tier)
             target = best_match
         else:
             # Use category-specific fallbacks
-            if any(x in old_url.lower() for x in ['beauty', 'makeup', 'feminine']):
-                target = 'https://tbfsna.myshopify.com/blogs/beauty'
-            elif any(x in old_url.lower() for x in ['tips', 'crossdressing', 'tutorial']):
-                target = 'https://tbfsna.myshopify.com/blogs/cd-tg-tips'
-            elif any(x in old_url.lower() for x in ['breast-form', 'bra', 'lingerie']):
-                target = 'https://tbfsna.myshopify.com/blogs/breast-forms-breast-form-care'
-            elif any(x in old_url.lower() for x in ['body', 'shaping', 'curve']):
-                target = 'https://tbfsna.myshopify.com/blogs/body-shaping'
-            else:
-                target = 'https://tbfsna.myshopify.com/blogs/community-stories'
+            target = fallback_blogs.target(old_url)
+            metrics.count('blog', fallback_tier(target))
         
         blog_redirects.append({
             'path': path,
@@ -113,31 +153,39 @@ def create_blog_redirects():
             'matched': best_match is not None
         })
     
+    if cache is not None:
+        cache.put_many(scope, catalog, [(slug, *decision) for slug, decision in fresh.items()])
+    
     print(f"Matched {matched_count} blog URLs directly")
     print(f"Created {len(blog_redirects)} blog redirects")
     
-    # Convert to DataFrame
-    blog_df = pd.DataFrame(blog_redirects)
+    return pd.DataFrame(blog_redirects)
+
+def create_blog_redirects():
+    """Create corrected blog redirects"""
+    print("Loading data...")
     
-    # Save detailed analysis
-    blog_df.to_excel('blog_redirects_corrected.xlsx', index=False)
-    print("Saved blog redirects to: blog_redirects_corrected.xlsx")
+    # Load old URLs
+    old_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\old\old.csv')
+    old_urls = unique_urls(old_df['url'].tolist())
     
-    # Create Shopify import files (only path and target columns)
-    shopify_df = blog_df[['path', 'target']].copy()
+    # Load new URLs
+    new_df = pd.read_csv(r'c:\Users\Pedro\Desktop\tbfs-sitemap\new\new.csv')
+    new_urls = new_df['url'].tolist()
     
-    # Create batches
-    batch_size = 250
-    total_batches = (len(shopify_df) + batch_size - 1) // batch_size
+    cache = default_cache()
+    try:
+        blog_df = match_blog_redirects(old_urls, new_urls, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
     
-    for i in range(total_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(shopify_df))
-        batch_df = shopify_df.iloc[start_idx:end_idx]
-        
-        batch_filename = f'blog_redirects_batch_{i+1}.csv'
-        batch_df.to_csv(batch_filename, index=False)
-        print(f"Created batch {i+1}: {len(batch_df)} redirects -> {batch_filename}")
+    # Save detailed analysis
+    output_file = write_table(blog_df, 'blog_redirects_corrected')
+    print(f"Saved blog redirects to: {output_file}")
+    
+    # Create Shopify import batches (only path and target columns)
+    write_batches(frame_rows(blog_df), 'blog_redirects_batch_{n}.csv')
     
     # Show distribution
     print(f"\nBlog redirect distribution:")
@@ -147,7 +195,9 @@ def create_blog_redirects():
     
     # Test specific case
     test_url = "https://thebreastformstore.com/crossdressing-101-how-to-walk-in-high-heels/"
-    test_match = find_blog_match(test_url, blog_urls)
+    blog_urls = [url for url in new_urls if '/blogs/' in url]
+    # blog_match_tier, not find_blog_match: the diagnostic must not count in the metrics
+    test_match, _ = blog_match_tier(test_url, blog_urls)
     print(f"\nTest case:")
     print(f"  Old: {test_url}")
     print(f"  Found match: {test_match}")
@@ -155,4 +205,9 @@ def create_blog_redirects():
     return blog_df
 
 if __name__ == "__main__":
-    create_blog_redirects()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create corrected blog redirects")
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    with metrics.stage('create_blog_redirects'):
+        create_blog_redirects()
+    save_metrics(args.metrics)
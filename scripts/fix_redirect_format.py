@@ -1,58 +1,72 @@
 import pandas as pd
+from redirect_io import read_table, write_table
+from batch_writer import frame_rows, write_batches
+from url_normalize import dedupe_redirects
 import re
-from urllib.parse import urlparse
+import os
 
-def fix_redirect_format():
-    """Fix redirects to use relative paths instead of full URLs"""
-    print("Fixing redirect format to use relative paths...")
+NEW_STORE = 'https://tbfsna.myshopify.com'
+
+def relativize_targets(df):
+    """Convert full new-store target URLs to relative paths
     
-    # Load the main Excel file
-    df = pd.read_excel('shopify_redirects_FINAL.xlsx')
+    Works column-wise on the distinct targets (thousands of rows share a
+    handful of them) and maps the result back through the factorized
+    codes. Equivalent to taking urlparse(target).path for every target on
+    the new store: the host is stripped, then query/fragment, then any
+    ;params on the last segment.
+    """
+    df = df.reset_index(drop=True)
     
     print(f"Processing {len(df)} redirects...")
     
-    # Convert full URLs to relative paths
-    for i, row in df.iterrows():
-        target_url = row['target']
-        
-        # Extract path from full URL
-        if target_url.startswith('https://tbfsna.myshopify.com'):
-            # Extract just the path part
-            parsed = urlparse(target_url)
-            relative_path = parsed.path
-            df.at[i, 'target'] = relative_path
-        elif target_url == 'https://tbfsna.myshopify.com/':
-            # Homepage becomes just /
-            df.at[i, 'target'] = '/'
-        
-        if i % 1000 == 0:
-            print(f"Processed {i+1}/{len(df)} redirects")
+    codes, uniques = pd.factorize(df['target'], use_na_sentinel=False)
+    targets = pd.Series(uniques, dtype=object)
+    on_store = targets.str.startswith(NEW_STORE, na=False)
+    paths = (targets[on_store]
+             .str.replace(r'^https://[^/?#]*', '', regex=True)
+             .str.replace(r'[?#].*$', '', regex=True)
+             .str.replace(r';[^/]*$', '', regex=True))
+    targets[on_store] = paths
+    df['target'] = targets.to_numpy()[codes] if len(codes) else df['target']
     
     print("Fixed all redirects to use relative paths")
     
+    return df
+
+def write_corrected_batches(df, batch_size=250, prefix='shopify_CORRECTED_batch', out_dir='.',
+                            max_bytes=None, compress=False, workers=1):
+    """Write Shopify import batches of at most batch_size rows / max_bytes, returning the file names"""
+    print("\nCreating corrected batch files...")
+    
+    batches = write_batches(frame_rows(df), prefix + '_{n}.csv', out_dir, batch_size, max_bytes,
+                            compress, workers)
+    
+    return [os.path.join(out_dir, entry['file']) for entry in batches]
+
+def fix_redirect_format():
+    """Fix redirects to use relative paths instead of full URLs"""
+    print("Fixing redirect format to use relative paths...")
+    
+    # Load the final redirect table
+    df = read_table('shopify_redirects_FINAL')
+    
+    df = relativize_targets(df)
+    
     # Show examples
     print("\nExamples of fixed redirects:")
     for i in range(min(10, len(df))):
         print(f"  {df.iloc[i]['path']} => {df.iloc[i]['target']}")
     
-    # Save corrected Excel file
-    df.to_excel('shopify_redirects_CORRECTED.xlsx', index=False)
-    print("\nSaved corrected file: shopify_redirects_CORRECTED.xlsx")
-    
-    # Create new batch files with corrected format
-    batch_size = 250
-    total_batches = (len(df) + batch_size - 1) // batch_size
+    # Save corrected table
+    output_file = write_table(df, 'shopify_redirects_CORRECTED')
+    print(f"\nSaved corrected file: {output_file}")
     
-    print(f"\nCreating {total_batches} corrected batch files...")
+    # Collapse equivalent paths (case, trailing slash, encoding, query) before export
+    export_df, _ = dedupe_redirects(df)
     
-    for i in range(total_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(df))
-        batch_df = df.iloc[start_idx:end_idx]
-        
-        batch_filename = f'shopify_CORRECTED_batch_{i+1}.csv'
-        batch_df.to_csv(batch_filename, index=False)
-        print(f"  Batch {i+1}: {len(batch_df)} redirects -> {batch_filename}")
+    # Create new batch files with corrected format
+    batch_files = write_corrected_batches(export_df)
     
     # Show target distribution
     print(f"\nTop redirect targets (relative paths):")
@@ -63,4 +77,4 @@ def fix_redirect_format():
     return df
 
 if __name__ == "__main__":
-    fix_redirect_format()
\ No newline at end of file
+    fix_redirect_format()
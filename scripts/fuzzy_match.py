@@ -0,0 +1,143 @@
+from collections import defaultdict
+
+from url_records import tokenize
+
+def bounded_levenshtein(a, b, max_dist):
+    """Edit distance between a and b, or max_dist + 1 as soon as it must exceed max_dist
+
+    Only the diagonal band of width 2 * max_dist + 1 is filled in, and
+    the scan stops on the first row whose band minimum is already past
+    the bound, so a hopeless pair costs a few rows instead of |a| x |b|.
+    """
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > max_dist:
+        return max_dist + 1
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    over = max_dist + 1
+    previous = [j if j <= max_dist else over for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        lo = max(1, i - max_dist)
+        hi = min(lb, i + max_dist)
+        current = [over] * (lb + 1)
+        if i <= max_dist:
+            current[0] = i
+        ca = a[i - 1]
+        best = current[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if cost > over:
+                cost = over
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > max_dist:
+            return over
+        previous = current
+    return previous[lb] if previous[lb] <= max_dist else over
+
+def qgrams(text, q):
+    padded = f"#{text}#"
+    return {padded[i:i + q] for i in range(len(padded) - q + 1)} or {padded}
+
+def sorted_tokens(slug):
+    """Slug with its tokens sorted, so 'pink-silicone-breast-forms' and 'breast-forms-pink-silicone' agree"""
+    return '-'.join(sorted(tokenize(slug)))
+
+def ratio_for(min_confidence, max_ratio=0.2):
+    """Smallest max_ratio that still finds every match scoring at least min_confidence
+
+    A match of d edits against a form of length n scores at most
+    1 - d / (n + d), so d <= (1 - c) / c * n.
+    """
+    if min_confidence <= 0:
+        return max_ratio
+    return min(max_ratio, max(0.0, (1 - min_confidence) / min_confidence))
+
+class FuzzyIndex:
+    """Near-miss slug lookup: length buckets + q-gram blocking, then bounded edit distance
+
+    Each slug is indexed twice, as written and with its tokens sorted, so
+    typos and reordered words both land within a few edits. A query only
+    looks at postings for lengths within the allowed distance, and only
+    verifies candidates that share enough q-grams to possibly be that
+    close (q-gram lemma: an edit destroys at most q grams). A slug that
+    keeps |grams| - q * k of the query's grams must share one of its
+    q * k + 1 rarest, so only those postings are walked (prefix filter);
+    the filter is exact, so no slug within k edits is ever missed.
+    """
+
+    def __init__(self, slugs, q=3, max_ratio=0.2, min_length=5):
+        self.slugs = list(slugs)
+        self.q = q
+        self.max_ratio = max_ratio
+        self.min_length = min_length
+        self.forms = []
+        self.grams = []
+        # (form, length, gram) -> ids, and (form, gram) -> how many slugs have it
+        self.postings = defaultdict(list)
+        self.df = defaultdict(int)
+        for i, slug in enumerate(self.slugs):
+            forms = (slug, sorted_tokens(slug))
+            grams = tuple(qgrams(form, q) for form in forms)
+            self.forms.append(forms)
+            self.grams.append(grams)
+            for f, form in enumerate(forms):
+                for gram in grams[f]:
+                    self.postings[(f, len(form), gram)].append(i)
+                    self.df[(f, gram)] += 1
+
+    def __len__(self):
+        return len(self.slugs)
+
+    def max_distance(self, length):
+        return max(1, int(length * self.max_ratio))
+
+    def candidates(self, form_id, form, k):
+        grams = qgrams(form, self.q)
+        # grams of the padded form that survive k edits; candidates below that cannot be within k
+        need = max(1, len(grams) - k * self.q)
+        df = self.df
+        probe = sorted(grams, key=lambda gram: (df.get((form_id, gram), 0), gram))[:len(grams) - need + 1]
+        found = set()
+        for length in range(max(1, len(form) - k), len(form) + k + 1):
+            for gram in probe:
+                found.update(self.postings.get((form_id, length, gram), ()))
+        return [i for i in found if len(grams & self.grams[i][form_id]) >= need]
+
+    def match(self, slug):
+        """(position, distance, confidence) of the most confident slug, or (-1, None, 0.0)
+
+        confidence is 1 - distance / the longer of the two strings
+        compared (raw or token-sorted), and candidates are ranked by it,
+        so a longer slug a few edits away can beat a shorter one with
+        fewer. Ties go to the earliest slug, like the other matchers'
+        'first' mode.
+        """
+        if not slug or len(slug) < self.min_length or not self.slugs:
+            return -1, None, 0.0
+        k = self.max_distance(len(slug))
+        # best as (position, distance, longer length): compared by distance / longer
+        best = None
+        for form_id, form in enumerate((slug, sorted_tokens(slug))):
+            for i in self.candidates(form_id, form, k):
+                other = self.forms[i][form_id]
+                longer = max(len(form), len(other))
+                # most edits that still score at least as well as the best so far
+                limit = k if best is None else min(k, best[1] * longer // best[2])
+                d = bounded_levenshtein(form, other, limit)
+                if d > limit:
+                    continue
+                if best is None or d * best[2] < best[1] * longer or (
+                        d * best[2] == best[1] * longer and i < best[0]):
+                    best = (i, d, longer)
+        if best is None:
+            return -1, None, 0.0
+        position, distance, longer = best
+        return position, distance, 1 - distance / longer
@@ -0,0 +1,120 @@
+import hashlib
+import json
+from pathlib import Path
+
+from containment import ContainmentMatcher
+from fuzzy_match import FuzzyIndex
+from create_redirects_fast import (MATCHER_VERSION, extract_slug, index_new_urls, index_typed_urls,
+                                   match_old_urls, redirects_frame)
+from instrumentation import metrics
+from url_categories import RULESETS
+from url_records import parse_url
+
+def load_lastmods(manifest_path):
+    """url -> lastmod from an extract.py --incremental manifest"""
+    files = json.loads(Path(manifest_path).read_text(encoding='utf-8')).get('files', {})
+    lastmods = {}
+    for entry in files.values():
+        for url, lastmod in entry['urls'].items():
+            if lastmod or url not in lastmods:
+                lastmods[url] = lastmod
+    return lastmods
+
+def rules_fingerprint():
+    return hashlib.sha256(json.dumps(RULESETS['fast'], sort_keys=True).encode()).hexdigest()
+
+def new_slug_entries(new_urls):
+    """slug -> URL in the same order match_redirects indexes them"""
+    entries = {}
+    for url in new_urls:
+        slug = extract_slug(url)
+        if slug:
+            entries[slug] = url
+    return entries
+
+def same_relative_order(previous, current):
+    """True if the slugs present in both catalogs keep their relative order"""
+    common = previous.keys() & current.keys()
+    return [s for s in previous if s in common] == [s for s in current if s in common]
+
+def stale_old_urls(old_urls, state, entries, lastmods):
+    """Old URLs whose candidate set or lastmod changed since the saved state"""
+    previous = dict(state['new_entries'])
+    changed = [slug for slug in previous.keys() | entries.keys() if previous.get(slug) != entries.get(slug)]
+    probe = ContainmentMatcher(sorted(changed))
+    near = FuzzyIndex(sorted(changed))
+    changed = set(changed)
+    results = state['results']
+
+    stale = []
+    for url in old_urls:
+        if 'tbfsna.myshopify.com' in url:
+            continue
+        saved = results.get(url)
+        if saved is None or saved[1] != lastmods.get(url):
+            stale.append(url)
+            continue
+        slug = extract_slug(url)
+        # a changed new slug equal to, inside, around, or a few edits from this slug may change its match
+        if slug and (slug in changed or probe.match(slug, 'all') or near.match(slug)[0] != -1):
+            stale.append(url)
+    return stale
+
+def match_redirects_incremental(old_urls, new_urls, state_path, partial_mode='first', lastmods=None,
+                                old_types=None, new_types=None, cache=None):
+    """match_redirects that only rematches old URLs affected by catalog or lastmod changes
+
+    The state file keeps the new catalog's slug entries and the previous
+    target per old URL. An old URL is rematched when it is new, its
+    lastmod changed, or a new slug that was added, removed or repointed
+    is exactly its slug, contains/is contained in it, or is within fuzzy
+    edit distance of it: those are the only changes that can move an
+    exact/partial/fuzzy match. Anything that would invalidate every
+    decision (matcher version, partial mode, fallback rules, or a
+    reordered catalog that changes which partial match comes first)
+    triggers a full rebuild, as does switching typed matching on or off.
+    """
+    lastmods = lastmods or {}
+    typed = bool(old_types and new_types)
+    state_path = Path(state_path)
+    entries = new_slug_entries(new_urls)
+
+    state = None
+    if state_path.exists():
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+        if (state.get('version') != MATCHER_VERSION or state.get('partial_mode') != partial_mode
+                or state.get('rules') != rules_fingerprint() or state.get('typed', False) != typed
+                or not same_relative_order(dict(state['new_entries']), entries)):
+            print("Incremental state is stale, rebuilding everything")
+            state = None
+
+    if state is None:
+        stale = [url for url in old_urls if 'tbfsna.myshopify.com' not in url]
+        results = {}
+    else:
+        stale = stale_old_urls(old_urls, state, entries, lastmods)
+        results = state['results']
+    print(f"Rematching {len(stale)} of {len(old_urls)} old URLs")
+
+    if stale:
+        typed_index = index_typed_urls(new_urls, new_types) if typed else None
+        for old_url, path, target in match_old_urls(stale, index_new_urls(new_urls), partial_mode,
+                                                    old_types=old_types, typed=typed_index, cache=cache):
+            results[old_url] = [target, lastmods.get(old_url)]
+
+    rows = [(url, parse_url(url).relative, results[url][0]) for url in old_urls if url in results]
+    # rematched URLs were counted per tier by match_old_urls; the rest keep their saved target
+    rematched = set(stale)
+    metrics.count('fast', 'reused', sum(1 for url, _, _ in rows if url not in rematched))
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps({
+        'version': MATCHER_VERSION,
+        'partial_mode': partial_mode,
+        'rules': rules_fingerprint(),
+        'typed': typed,
+        'new_entries': list(entries.items()),
+        'results': {url: results[url] for url in old_urls if url in results},
+    }), encoding='utf-8')
+
+    return redirects_frame(rows)
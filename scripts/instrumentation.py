@@ -0,0 +1,161 @@
+import copy
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Standalone scripts write their metrics here unless --metrics says otherwise
+DEFAULT_METRICS_PATH = os.environ.get('TBFS_METRICS', '')
+
+# Match tiers, cheapest first; every matched URL lands in exactly one.
+# 'reused' counts URLs whose target was carried over from an incremental state file.
+TIERS = ('exact_slug', 'partial_slug', 'fuzzy', 'keyword', 'lsh', 'category_fallback', 'root', 'reused')
+
+def fallback_tier(target):
+    """'root' when a fallback sends the URL to the homepage, else 'category_fallback'"""
+    return 'root' if urlsplit(target).path in ('', '/') else 'category_fallback'
+
+class SamplingProfiler:
+    """Poor man's sampling profiler: a thread that records the innermost frames of one thread
+
+    Every `interval` seconds the target thread's stack is read through
+    sys._current_frames() and each of its `depth` innermost functions is
+    counted, so the report shows where wall time goes without tracing
+    every call.
+    """
+
+    def __init__(self, interval=0.005, depth=8, thread_id=None):
+        self.interval = interval
+        self.depth = depth
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = 0
+        self.functions = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            for _ in range(self.depth):
+                if frame is None:
+                    break
+                code = frame.f_code
+                key = f"{Path(code.co_filename).name}:{code.co_name}"
+                # count recursive functions once per sample
+                if key not in seen:
+                    seen.add(key)
+                    self.functions[key] += 1
+                frame = frame.f_back
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def report(self, top=30):
+        return {
+            'interval': self.interval,
+            'samples': self.samples,
+            'functions': [{'function': name, 'samples': count,
+                           'share': round(count / self.samples, 4) if self.samples else 0.0}
+                          for name, count in self.functions.most_common(top)],
+        }
+
+class Metrics:
+    """Per-stage wall time and allocations plus match-tier counters, dumped as JSON
+
+    Stages are timed with the `stage` context manager; allocations are
+    only measured when trace_memory is on, since tracemalloc slows
+    Python code down noticeably. Tier counts are grouped by matcher
+    ('fast', 'comprehensive', 'blog') because each script has its own
+    tiers and fallbacks.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, trace_memory=False, profile_interval=None):
+        self.stages = {}
+        self.tiers = {}
+        self.trace_memory = trace_memory
+        self.profiler = SamplingProfiler(profile_interval) if profile_interval else None
+        self.started = time.time()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] = round(entry['seconds'] + time.perf_counter() - start, 6)
+            entry['calls'] += 1
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                entry['allocated_mb'] = round((current - before) / 2**20, 3)
+                entry['peak_mb'] = round(max(entry.get('peak_mb', 0.0), (peak - before) / 2**20), 3)
+
+    def count(self, matcher, tier, n=1):
+        counts = self.tiers.get(matcher)
+        if counts is None:
+            counts = self.tiers[matcher] = Counter()
+        counts[tier] += n
+
+    def start_profiler(self):
+        if self.profiler:
+            self.profiler.start()
+
+    def stop_profiler(self):
+        if self.profiler:
+            self.profiler.stop()
+
+    def to_dict(self):
+        data = {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'stages': self.stages,
+            'tiers': {matcher: {tier: counts.get(tier, 0) for tier in TIERS}
+                      for matcher, counts in self.tiers.items()},
+        }
+        if self.profiler:
+            data['profile'] = self.profiler.report()
+        return data
+
+    def snapshot(self):
+        """to_dict() detached from the live counters, safe to keep while matching goes on"""
+        return copy.deepcopy(self.to_dict())
+
+    def write_json(self, path):
+        Path(path).write_text(json.dumps(self.snapshot(), indent=2), encoding='utf-8')
+        return path
+
+# Shared by every script in the run, like url_records.default_cache
+metrics = Metrics()
+
+def add_metrics_argument(parser):
+    parser.add_argument('--metrics', default=DEFAULT_METRICS_PATH or None,
+                        help="write stage timings and match-tier counts as JSON here (default: $TBFS_METRICS)")
+
+def save_metrics(path):
+    """Dump the shared metrics to `path`, if one was given"""
+    if path:
+        metrics.write_json(path)
+        print(f"Saved metrics to: {path}")
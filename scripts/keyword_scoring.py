@@ -0,0 +1,152 @@
+import numpy as np
+from url_records import tokenize
+
+# Function words that say nothing about a post's topic: 'how-to-pass' must not
+# match 'how-to-tie-a-corset' on 'how' + 'to'. Dropped from slugs and queries alike.
+STOPWORDS = frozenset("""
+a about after all an and any are as at be before by can do does for from get how i if in into is it its
+me my not of on or our out over s so than that the their them then these this those to up us vs was we
+what when where which who why will with you your
+""".split())
+
+class KeywordScorer:
+    """Sparse TF-IDF / BM25 keyword scorer over a fixed list of slugs.
+
+    The document side is stored once as a token -> (doc ids, weights)
+    postings matrix. Queries are scored in batches: every (query, token)
+    pair is expanded against the postings of that token and accumulated
+    with np.bincount, which is the sparse product Q @ D.T without ever
+    materializing a dense vocabulary axis. Query tokens are binary, like
+    the old set-overlap count, so a token only contributes its document
+    weight once. Stopwords are left out on both sides.
+    """
+
+    def __init__(self, slugs, weighting='bm25', k1=1.2, b=0.75, stopwords=STOPWORDS):
+        if weighting not in ('bm25', 'tfidf'):
+            raise ValueError(f"Unknown weighting {weighting!r}, expected 'bm25' or 'tfidf'")
+        self.slugs = list(slugs)
+        self.weighting = weighting
+        self.stopwords = frozenset(stopwords)
+        self.vocab = {}
+        self.cache = {}
+
+        doc_tokens = [self.tokens(slug) for slug in self.slugs]
+        rows, cols, counts = [], [], []
+        for doc, tokens in enumerate(doc_tokens):
+            tf = {}
+            for token in tokens:
+                tf[token] = tf.get(token, 0) + 1
+            for token, count in tf.items():
+                rows.append(self.vocab.setdefault(token, len(self.vocab)))
+                cols.append(doc)
+                counts.append(count)
+
+        n_docs = len(self.slugs)
+        token_ids = np.asarray(rows, dtype=np.int64)
+        docs = np.asarray(cols, dtype=np.int64)
+        tf = np.asarray(counts, dtype=np.float64)
+        df = np.bincount(token_ids, minlength=len(self.vocab)).astype(np.float64)
+        doc_len = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float64)
+
+        if weighting == 'bm25':
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            avg_len = doc_len.mean() if n_docs else 0.0
+            norm = k1 * (1 - b + b * doc_len[docs] / avg_len) if avg_len else k1
+            weights = idf[token_ids] * tf * (k1 + 1) / (tf + norm)
+        else:
+            idf = np.log((1 + n_docs) / (1 + df)) + 1
+            weights = tf * idf[token_ids]
+            # L2-normalize each document vector
+            norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=n_docs))
+            weights = weights / np.where(norms > 0, norms, 1)[docs]
+
+        # CSR over documents (rows were built doc by doc) for scoring shortlists
+        self.doc_tokens = token_ids
+        self.doc_weights = weights
+        self.doc_indptr = np.concatenate(([0], np.cumsum(np.bincount(docs, minlength=n_docs)))).astype(np.int64)
+        
+        # CSR over tokens: postings of token t live in [indptr[t], indptr[t+1])
+        order = np.argsort(token_ids, kind='stable')
+        self.post_docs = docs[order]
+        self.post_weights = weights[order]
+        self.indptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.slugs)
+
+    def tokens(self, slug):
+        return [token for token in tokenize(slug) if token not in self.stopwords]
+
+    def _query_tokens(self, slug):
+        ids = {self.vocab[token] for token in self.tokens(slug) if token in self.vocab}
+        return sorted(ids)
+
+    def score_batch(self, query_slugs, max_cells=5_000_000):
+        """Best document index and score for each query slug (index -1 when nothing overlaps)"""
+        n_docs = len(self.slugs)
+        best_idx = np.full(len(query_slugs), -1, dtype=np.int64)
+        best_score = np.zeros(len(query_slugs), dtype=np.float64)
+        if not n_docs or not len(query_slugs):
+            return best_idx, best_score
+
+        step = max(1, max_cells // n_docs)
+        for start in range(0, len(query_slugs), step):
+            chunk = query_slugs[start:start + step]
+            q_rows, q_tokens = [], []
+            for row, slug in enumerate(chunk):
+                ids = self._query_tokens(slug)
+                q_rows.extend([row] * len(ids))
+                q_tokens.extend(ids)
+            if not q_tokens:
+                continue
+            q_rows = np.asarray(q_rows, dtype=np.int64)
+            q_tokens = np.asarray(q_tokens, dtype=np.int64)
+
+            # expand each (query, token) pair over that token's postings
+            starts = self.indptr[q_tokens]
+            lengths = self.indptr[q_tokens + 1] - starts
+            total = int(lengths.sum())
+            if not total:
+                continue
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            cells = np.repeat(q_rows, lengths) * n_docs + self.post_docs[offsets]
+            scores = np.bincount(cells, weights=self.post_weights[offsets],
+                                 minlength=len(chunk) * n_docs).reshape(len(chunk), n_docs)
+
+            # argmax keeps the first document on ties, like the old strict '>' scan
+            idx = scores.argmax(axis=1)
+            top = scores[np.arange(len(chunk)), idx]
+            hit = top > 0
+            best_idx[start:start + len(chunk)] = np.where(hit, idx, -1)
+            best_score[start:start + len(chunk)] = top
+        return best_idx, best_score
+
+    def best_among(self, slug, candidates, min_score=0.0):
+        """best() restricted to the given document indices, for verifying an LSH shortlist"""
+        candidates = np.asarray(candidates, dtype=np.int64)
+        query = self._query_tokens(slug)
+        if not len(candidates) or not query:
+            return -1
+        starts = self.doc_indptr[candidates]
+        lengths = self.doc_indptr[candidates + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        hits = np.isin(self.doc_tokens[offsets], query)
+        scores = np.bincount(np.repeat(np.arange(len(candidates)), lengths)[hits],
+                             weights=self.doc_weights[offsets][hits], minlength=len(candidates))
+        # candidates arrive sorted, so argmax keeps the first document on ties like score_batch
+        i = int(scores.argmax())
+        return int(candidates[i]) if scores[i] > min_score else -1
+
+    def prime(self, query_slugs):
+        """Score many slugs in one batch and keep the results for best()"""
+        pending = [slug for slug in dict.fromkeys(query_slugs) if slug not in self.cache]
+        idx, score = self.score_batch(pending)
+        for slug, i, s in zip(pending, idx.tolist(), score.tolist()):
+            self.cache[slug] = (i, s)
+
+    def best(self, slug, min_score=0.0):
+        """Best matching document index for slug, or -1 if it scores at or below min_score"""
+        if slug not in self.cache:
+            self.prime([slug])
+        i, score = self.cache[slug]
+        return i if i != -1 and score > min_score else -1
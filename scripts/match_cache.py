@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import time
+from hashlib import blake2b
+
+# Standalone scripts keep their decisions here; TBFS_MATCH_CACHE=0 turns it off
+DEFAULT_PATH = os.environ.get('TBFS_MATCH_CACHE', 'match_cache.sqlite')
+MAX_ROWS = 1_000_000
+# SQLite's default limit on bound parameters is 999
+CHUNK = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    scope   TEXT NOT NULL,
+    catalog TEXT NOT NULL,
+    slug    TEXT NOT NULL,
+    target  TEXT,
+    tier    TEXT,
+    used    REAL NOT NULL,
+    PRIMARY KEY (scope, catalog, slug)
+);
+CREATE INDEX IF NOT EXISTS decisions_used ON decisions (used);
+"""
+
+def catalog_hash(values):
+    """Fingerprint of the new-side candidates a matcher saw, in order (order decides 'first' partial matches)"""
+    h = blake2b(digest_size=16)
+    for value in values:
+        h.update(value.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+class MatchCache:
+    """On-disk slug -> (target, tier) decisions that survive between runs
+
+    Rows are keyed on (scope, catalog, slug): scope names the matcher
+    with its version and settings, catalog is catalog_hash() of the new
+    URLs it matched against, so a changed catalog or matcher simply
+    misses. Only slug-determined decisions are stored; a None target
+    records "no slug match", leaving the per-URL category fallback to
+    the caller. Hits refresh their last-used time and prune() drops the
+    least recently used rows beyond max_rows.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_rows=MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, scope, catalog, slugs):
+        """{slug: (target, tier)} for every slug with a stored decision (empty slugs are never stored)"""
+        slugs = [slug for slug in dict.fromkeys(slugs) if slug]
+        found = {}
+        for start in range(0, len(slugs), CHUNK):
+            chunk = slugs[start:start + CHUNK]
+            rows = self.db.execute(
+                f"SELECT slug, target, tier FROM decisions WHERE scope = ? AND catalog = ? "
+                f"AND slug IN ({','.join('?' * len(chunk))})", [scope, catalog, *chunk])
+            for slug, target, tier in rows:
+                found[slug] = (target, tier)
+        if found:
+            now = time.time()
+            with self.db:
+                self.db.executemany("UPDATE decisions SET used = ? WHERE scope = ? AND catalog = ? AND slug = ?",
+                                    [(now, scope, catalog, slug) for slug in found])
+        self.hits += len(found)
+        self.misses += len(slugs) - len(found)
+        return found
+
+    def put_many(self, scope, catalog, decisions):
+        """Store (slug, target, tier) decisions, replacing older ones for the same key"""
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?, ?, ?)",
+                                [(scope, catalog, slug, target, tier, now) for slug, target, tier in decisions if slug])
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def prune(self, max_rows=None):
+        """Drop the least recently used rows beyond max_rows, returning how many went"""
+        max_rows = self.max_rows if max_rows is None else max_rows
+        excess = len(self) - max_rows
+        if excess <= 0:
+            return 0
+        with self.db:
+            self.db.execute("DELETE FROM decisions WHERE rowid IN "
+                            "(SELECT rowid FROM decisions ORDER BY used LIMIT ?)", (excess,))
+        return excess
+
+    def close(self):
+        pruned = self.prune()
+        print(f"Match cache {self.path}: {self.hits} hits, {self.misses} misses, "
+              f"{len(self)} decisions stored" + (f", {pruned} pruned" if pruned else ''))
+        self.db.close()
+
+def default_cache():
+    """MatchCache at DEFAULT_PATH, or None when TBFS_MATCH_CACHE disables it"""
+    return MatchCache(DEFAULT_PATH) if DEFAULT_PATH not in ('', '0') else None
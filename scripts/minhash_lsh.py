@@ -0,0 +1,108 @@
+import zlib
+
+import numpy as np
+
+from url_records import tokenize
+
+# Mersenne prime for the universal hashes; a * x + b stays below 2**62, so uint64 never wraps
+PRIME = np.uint64((1 << 31) - 1)
+MAX_CELLS = 4_000_000
+
+def shingles(slug, q=None):
+    """Token set of a slug, or its character q-grams when q is given"""
+    if q:
+        return {slug[i:i + q] for i in range(max(1, len(slug) - q + 1))} if slug else set()
+    return set(tokenize(slug))
+
+def best_bands(num_perm, threshold):
+    """Band count whose LSH threshold (1/bands) ** (1/rows) is closest to `threshold`"""
+    options = [b for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda b: abs((1 / b) ** (b / num_perm) - threshold))
+
+class MinHashLSH:
+    """MinHash signatures over slug shingles, bucketed by LSH bands for sub-linear candidate lookup
+
+    Two slugs with Jaccard similarity s share at least one band with
+    probability 1 - (1 - s**rows)**bands, so more bands (fewer rows per
+    band) raise recall and shortlist size, fewer bands raise precision.
+    `threshold` picks the split for num_perm; pass bands to set it
+    directly. Candidates are only a shortlist: callers verify them with
+    an exact score.
+    """
+
+    def __init__(self, slugs, num_perm=64, threshold=0.2, bands=None, q=None, seed=1):
+        self.slugs = list(slugs)
+        self.num_perm = num_perm
+        self.bands = bands or best_bands(num_perm, threshold)
+        if num_perm % self.bands:
+            raise ValueError(f"bands ({self.bands}) must divide num_perm ({num_perm})")
+        self.rows = num_perm // self.bands
+        self.q = q
+        self.cache = {}
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(PRIME), size=num_perm, dtype=np.uint64)
+        # odd multipliers that fold the rows of a band into one uint64 key
+        self.fold = rng.integers(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        keys, valid = self.band_keys(self.slugs)
+        ids = np.flatnonzero(valid)
+        self.tables = []
+        for band in range(self.bands):
+            band_keys = keys[ids, band]
+            order = np.argsort(band_keys, kind='stable')
+            self.tables.append((band_keys[order], ids[order]))
+
+    def __len__(self):
+        return len(self.slugs)
+
+    @property
+    def threshold(self):
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def signatures(self, slugs):
+        """(len(slugs), num_perm) MinHash matrix and a mask of slugs that had any shingle"""
+        sigs = np.full((len(slugs), self.num_perm), PRIME, dtype=np.uint64)
+        sets = [shingles(slug, self.q) for slug in slugs]
+        valid = np.array([bool(s) for s in sets], dtype=bool)
+        step = max(1, MAX_CELLS // (self.num_perm * 8))
+        for start in range(0, len(sets), step):
+            chunk = [(i, s) for i, s in enumerate(sets[start:start + step], start) if s]
+            if not chunk:
+                continue
+            rows = np.array([i for i, _ in chunk], dtype=np.int64)
+            sizes = np.array([len(s) for _, s in chunk], dtype=np.int64)
+            hashes = np.fromiter((zlib.crc32(x.encode('utf-8')) for _, s in chunk for x in s),
+                                 dtype=np.uint64, count=int(sizes.sum())) % PRIME
+            permuted = (hashes[:, None] * self.a + self.b) % PRIME
+            sigs[rows] = np.minimum.reduceat(permuted, np.concatenate(([0], np.cumsum(sizes)[:-1])), axis=0)
+        return sigs, valid
+
+    def band_keys(self, slugs):
+        sigs, valid = self.signatures(slugs)
+        keys = (sigs.reshape(len(slugs), self.bands, self.rows) * self.fold).sum(axis=2, dtype=np.uint64)
+        return keys, valid
+
+    def candidates_batch(self, slugs):
+        """Candidate slug positions (sorted, unique) for each query slug"""
+        keys, valid = self.band_keys(slugs)
+        found = [[] for _ in slugs]
+        for band, (table_keys, table_ids) in enumerate(self.tables):
+            left = np.searchsorted(table_keys, keys[:, band], 'left')
+            right = np.searchsorted(table_keys, keys[:, band], 'right')
+            for i in np.flatnonzero((right > left) & valid):
+                found[i].append(table_ids[left[i]:right[i]])
+        return [np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+                for parts in found]
+
+    def prime(self, slugs):
+        """Shortlist many slugs in one batch and keep the results for candidates()"""
+        pending = [slug for slug in dict.fromkeys(slugs) if slug not in self.cache]
+        for slug, found in zip(pending, self.candidates_batch(pending)):
+            self.cache[slug] = found
+
+    def candidates(self, slug):
+        if slug not in self.cache:
+            self.prime([slug])
+        return self.cache[slug]
@@ -0,0 +1,168 @@
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+from hashlib import blake2b
+from pathlib import Path
+
+from resolve_chains import DEFAULT_TABLES, REPO, load_redirect_tables
+from url_normalize import canonical_path
+
+MAGIC = b'TBFSRDR1'
+# magic, keys, buckets, distinct targets, key blob bytes, target blob bytes
+HEADER = struct.Struct('<8sIIIII')
+
+# Layout after the header, every section uint32 little-endian and 4-byte aligned:
+#   displacements[buckets]           seed per first-level bucket
+#   slots[keys * 3]                  key offset, key length, target id
+#   target_offsets[targets + 1]      into the target blob
+#   key blob, target blob            UTF-8, no separators
+#
+# Keys are the normalized paths (lowercase, no trailing slash), so lookups are
+# case and trailing-slash insensitive like the Shopify redirect layer.
+
+def key_hash(key, seed):
+    return int.from_bytes(blake2b(key, digest_size=8, salt=struct.pack('<Q', seed)).digest(), 'little')
+
+def build_mph(keys, load=4):
+    """Hash-and-displace minimal perfect hash: bucket by seed 0, then find a seed per bucket
+
+    Buckets are placed largest first while the table is still empty;
+    each gets the first seed that sends all its keys to distinct free
+    slots. Returns (displacements, slot_of_key).
+    """
+    n = len(keys)
+    n_buckets = max(1, (n + load - 1) // load)
+    buckets = [[] for _ in range(n_buckets)]
+    for i, key in enumerate(keys):
+        buckets[key_hash(key, 0) % n_buckets].append(i)
+
+    displacements = array('I', [0]) * n_buckets
+    slot_of_key = [0] * n
+    taken = bytearray(n)
+    for b in sorted(range(n_buckets), key=lambda b: -len(buckets[b])):
+        members = buckets[b]
+        if not members:
+            continue
+        seed = 1
+        while True:
+            slots = [key_hash(keys[i], seed) % n for i in members]
+            if len(set(slots)) == len(slots) and not any(taken[s] for s in slots):
+                break
+            seed += 1
+        displacements[b] = seed
+        for i, s in zip(members, slots):
+            taken[s] = 1
+            slot_of_key[i] = s
+    return displacements, slot_of_key
+
+def compile_table(df):
+    """Binary image for a path/target frame; the first row per normalized path wins"""
+    mapping = {}
+    for path, target in zip(df['path'], df['target']):
+        if not path.startswith('/'):
+            path = '/' + path
+        mapping.setdefault(canonical_path(path), target)
+
+    keys = [k.encode('utf-8') for k in mapping]
+    target_ids = {}
+    for target in mapping.values():
+        target_ids.setdefault(target, len(target_ids))
+
+    displacements, slot_of_key = build_mph(keys)
+
+    key_blob = bytearray()
+    slots = array('I', [0]) * (3 * len(keys))
+    for i, (key, target) in enumerate(zip(keys, mapping.values())):
+        s = slot_of_key[i]
+        slots[3 * s:3 * s + 3] = array('I', [len(key_blob), len(key), target_ids[target]])
+        key_blob += key
+
+    target_blob = bytearray()
+    target_offsets = array('I', [0])
+    for target in target_ids:
+        target_blob += target.encode('utf-8')
+        target_offsets.append(len(target_blob))
+    # pad so the file length stays a multiple of 4
+    key_blob += b'\0' * (-len(key_blob) % 4)
+
+    sections = [displacements, slots, target_offsets]
+    if sys.byteorder != 'little':
+        for section in sections:
+            section.byteswap()
+    header = HEADER.pack(MAGIC, len(keys), len(displacements), len(target_ids), len(key_blob), len(target_blob))
+    return header + b''.join(s.tobytes() for s in sections) + bytes(key_blob) + bytes(target_blob)
+
+class RedirectImage:
+    """Zero-copy reader over a compiled table: mmap the file, hash, verify the key, return the target"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_keys, self.n_buckets, self.n_targets, key_len, target_len = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled redirect table")
+        if sys.byteorder != 'little':
+            raise ValueError("Compiled redirect tables are little-endian only")
+
+        view = memoryview(self.mm)
+        offset = HEADER.size
+        self.displacements = view[offset:offset + 4 * self.n_buckets].cast('I')
+        offset += 4 * self.n_buckets
+        self.slots = view[offset:offset + 12 * self.n_keys].cast('I')
+        offset += 12 * self.n_keys
+        self.target_offsets = view[offset:offset + 4 * (self.n_targets + 1)].cast('I')
+        offset += 4 * (self.n_targets + 1)
+        self.keys = view[offset:offset + key_len]
+        self.targets = view[offset + key_len:offset + key_len + target_len]
+
+    def __len__(self):
+        return self.n_keys
+
+    def lookup(self, path):
+        if not self.n_keys:
+            return None
+        key = canonical_path(path).encode('utf-8')
+        seed = self.displacements[key_hash(key, 0) % self.n_buckets]
+        s = 3 * (key_hash(key, seed) % self.n_keys)
+        start, length, target_id = self.slots[s], self.slots[s + 1], self.slots[s + 2]
+        # a perfect hash maps unknown keys somewhere too, so check the stored key
+        if self.keys[start:start + length] != key:
+            return None
+        begin, end = self.target_offsets[target_id], self.target_offsets[target_id + 1]
+        return str(self.targets[begin:end], 'utf-8')
+
+    def close(self):
+        for attr in ('displacements', 'slots', 'target_offsets', 'keys', 'targets'):
+            getattr(self, attr).release()
+        self.mm.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile redirect CSVs into a memory-mappable lookup table")
+    parser.add_argument('tables', nargs='*', help="redirect CSVs in priority order (default: the repo tables)")
+    parser.add_argument('-o', '--output', default='redirects.bin')
+    parser.add_argument('--check', action='store_true', help="read the image back and look up every row")
+    args = parser.parse_args()
+
+    tables = args.tables or [REPO / name for name in DEFAULT_TABLES]
+    df = load_redirect_tables(tables)
+    csv_bytes = sum(Path(t).stat().st_size for t in tables)
+
+    image = compile_table(df)
+    Path(args.output).write_bytes(image)
+    print(f"Compiled {len(df)} rows from {len(tables)} tables ({csv_bytes / 1024:.0f} KB of CSV) "
+          f"into {args.output}: {len(image) / 1024:.0f} KB")
+
+    if args.check:
+        reader = RedirectImage(args.output)
+        expected = {}
+        for path, target in zip(df['path'], df['target']):
+            expected.setdefault(canonical_path(path if path.startswith('/') else '/' + path), target)
+        wrong = [p for p, t in expected.items() if reader.lookup(p) != t]
+        print(f"Checked {len(expected)} keys: {len(wrong)} mismatches, "
+              f"{reader.n_targets} distinct targets")
+        reader.close()
+
+if __name__ == "__main__":
+    main()
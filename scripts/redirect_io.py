@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (parquet/feather engine)
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+FORMATS = {'parquet': '.parquet', 'feather': '.feather', 'xlsx': '.xlsx', 'csv': '.csv'}
+
+# Intermediate tables are columnar when pyarrow is installed; TBFS_TABLE_FORMAT=xlsx
+# restores the old Excel hand-off. TBFS_EXPORT_EXCEL=1 writes an .xlsx copy next to
+# every table for people who want to open it.
+DEFAULT_FORMAT = os.environ.get('TBFS_TABLE_FORMAT') or ('parquet' if HAVE_ARROW else 'xlsx')
+EXPORT_EXCEL = os.environ.get('TBFS_EXPORT_EXCEL', '') not in ('', '0')
+
+# Columns with few distinct values (thousands of rows point at '/') are stored dictionary-encoded
+DICTIONARY_COLUMNS = ('target',)
+
+def table_path(stem, fmt=None):
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown table format {fmt!r}, expected one of {list(FORMATS)}")
+    return Path(f"{stem}{FORMATS[fmt]}")
+
+def _require_arrow(fmt):
+    if fmt in ('parquet', 'feather') and not HAVE_ARROW:
+        raise ImportError(f"Writing {fmt} tables needs pyarrow (pip install pyarrow), "
+                          f"or set TBFS_TABLE_FORMAT=xlsx")
+
+def write_table(df, stem, fmt=None, excel=None):
+    """Write df as `stem` + the format's extension and return the path"""
+    fmt = fmt or DEFAULT_FORMAT
+    _require_arrow(fmt)
+    path = table_path(stem, fmt)
+    if fmt in ('parquet', 'feather'):
+        encoded = df.reset_index(drop=True)
+        for column in DICTIONARY_COLUMNS:
+            if column in encoded:
+                encoded[column] = encoded[column].astype('category')
+        if fmt == 'parquet':
+            encoded.to_parquet(path, index=False)
+        else:
+            encoded.to_feather(path)
+    elif fmt == 'xlsx':
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    if (EXPORT_EXCEL if excel is None else excel) and fmt != 'xlsx':
+        df.to_excel(table_path(stem, 'xlsx'), index=False)
+    return path
+
+# Files written within this many seconds of the newest count as the same run (e.g. the .xlsx export copy)
+SAME_RUN_SECONDS = 2.0
+
+def find_table(stem):
+    """Path of the most recently written table for `stem`
+
+    A table left over in another format by an earlier run is never
+    preferred over a newer one. Among files from the same run, the
+    configured DEFAULT_FORMAT wins, then columnar files over Excel.
+    """
+    order = [DEFAULT_FORMAT] + [fmt for fmt in ('parquet', 'feather', 'csv', 'xlsx') if fmt != DEFAULT_FORMAT]
+    found = [(table_path(stem, fmt), rank) for rank, fmt in enumerate(order) if table_path(stem, fmt).exists()]
+    if not found:
+        raise FileNotFoundError(f"No table found for {stem} (looked for {', '.join(FORMATS.values())})")
+    newest = max(path.stat().st_mtime for path, _ in found)
+    recent = [(rank, path) for path, rank in found if path.stat().st_mtime >= newest - SAME_RUN_SECONDS]
+    return min(recent)[1]
+
+def read_table(stem, keep_categories=False):
+    """Load the table written for `stem`, whatever format it was saved in
+
+    Dictionary-encoded columns come back as plain strings unless
+    keep_categories is set, so callers can assign new values freely.
+    """
+    path = find_table(stem)
+    if path.suffix == '.parquet':
+        df = pd.read_parquet(path)
+    elif path.suffix == '.feather':
+        df = pd.read_feather(path)
+    elif path.suffix == '.xlsx':
+        df = pd.read_excel(path)
+    else:
+        df = pd.read_csv(path)
+    if not keep_categories:
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype(object)
+    return df
@@ -0,0 +1,167 @@
+import argparse
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from create_redirects_fast import match_redirects
+from fix_blog_redirects_new import match_blog_redirects
+from create_final_redirects import apply_blog_overrides, apply_manual_fixes
+from fix_redirect_format import relativize_targets, write_corrected_batches
+from redirect_io import FORMATS, write_table
+from incremental import load_lastmods, match_redirects_incremental
+from resolve_chains import collapse_chains
+from instrumentation import add_metrics_argument, metrics, save_metrics
+from url_normalize import dedupe_redirects, unique_urls
+from url_catalog import lastmods as catalog_lastmods, load_catalog, source_types
+from match_cache import MatchCache
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Checkpoint table per stage, named after the table the standalone script writes
+CHECKPOINTS = {
+    'match': 'shopify_redirects_new',
+    'blog': 'blog_redirects_corrected',
+    'final': 'shopify_redirects_FINAL',
+    'corrected': 'shopify_redirects_CORRECTED',
+}
+
+def checkpoint(df, stage, checkpoint_dir, fmt=None, excel=None):
+    """Save a stage result if checkpointing is enabled"""
+    if checkpoint_dir is None:
+        return
+    path = write_table(df, Path(checkpoint_dir) / CHECKPOINTS[stage], fmt, excel)
+    print(f"  checkpoint -> {path}")
+
+def run_pipeline(old_urls, new_urls, out_dir='.', checkpoint_dir=None, batch_size=250,
+                 partial_mode='first', fmt=None, excel=None, state_path=None, lastmods=None,
+                 max_batch_bytes=None, compress=False, batch_workers=1, approximate=False,
+                 old_types=None, new_types=None, match_cache=None):
+    """Run match -> blog override -> manual fixes -> relativize -> resolve chains -> normalize -> batch in one process
+
+    Every stage hands its DataFrame straight to the next; nothing is read
+    back from disk. With checkpoint_dir set, each intermediate table is
+    also written under the same name the standalone scripts use, so a
+    single stage can still be rerun by hand from there. Stage timings
+    and match-tier counts accumulate in instrumentation.metrics.
+    old_types/new_types (url -> source type from the extract.py catalogs)
+    make the matchers compare only URLs of comparable types. match_cache
+    (a match_cache.MatchCache) lets both matchers reuse earlier decisions.
+    """
+    def stage(name, func, *args, **kwargs):
+        print(f"\n=== {name} ===")
+        with metrics.stage(name):
+            return func(*args, **kwargs)
+
+    if state_path:
+        main_df = stage('match', match_redirects_incremental, old_urls, new_urls, state_path,
+                        partial_mode, lastmods, old_types, new_types, match_cache)
+    else:
+        main_df = stage('match', match_redirects, old_urls, new_urls, partial_mode,
+                        old_types=old_types, new_types=new_types, cache=match_cache)
+    checkpoint(main_df, 'match', checkpoint_dir, fmt, excel)
+
+    blog_df = stage('blog', match_blog_redirects, old_urls, new_urls, approximate, old_types, new_types,
+                    match_cache)
+    checkpoint(blog_df, 'blog', checkpoint_dir, fmt, excel)
+
+    merged_df = stage('blog override', apply_blog_overrides, main_df, blog_df)
+    final_df = stage('manual fixes', apply_manual_fixes, merged_df)
+    checkpoint(final_df, 'final', checkpoint_dir, fmt, excel)
+
+    corrected_df = stage('relativize', relativize_targets, final_df)
+    checkpoint(corrected_df, 'corrected', checkpoint_dir, fmt, excel)
+
+    os.makedirs(out_dir, exist_ok=True)
+    flat_df, cycles_df = stage('resolve chains', collapse_chains, corrected_df)
+    if len(cycles_df):
+        cycles_df.to_csv(os.path.join(out_dir, 'redirect_cycles.csv'), index=False)
+    corrected_df, removed_df = stage('normalize', dedupe_redirects, flat_df[['path', 'target']])
+    if len(removed_df):
+        removed_df.to_csv(os.path.join(out_dir, 'normalized_duplicates.csv'), index=False)
+
+    batch_files = stage('batch', write_corrected_batches, corrected_df, batch_size, out_dir=out_dir,
+                        max_bytes=max_batch_bytes, compress=compress, workers=batch_workers)
+
+    print(f"\n=== PIPELINE SUMMARY ===")
+    print(f"Total redirects: {len(corrected_df)}")
+    print(f"Batch files: {len(batch_files)} in {out_dir}")
+    for name, entry in metrics.stages.items():
+        memory = f", peak {entry['peak_mb']:.1f} MB" if 'peak_mb' in entry else ''
+        print(f"  {name}: {entry['seconds']:.2f}s{memory}")
+    for matcher, counts in metrics.to_dict()['tiers'].items():
+        print(f"  {matcher} tiers: " + ', '.join(f"{tier} {n}" for tier, n in counts.items()))
+
+    return corrected_df
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Shopify redirect batches in one process")
+    parser.add_argument('--old', default=REPO / 'old' / 'old.csv', help="CSV of old site URLs ('url' column)")
+    parser.add_argument('--new', default=REPO / 'new' / 'new.csv', help="CSV of new store URLs ('url' column)")
+    parser.add_argument('--old-catalog', default=None,
+                        help="old/catalog.parquet from extract.py: read old URLs, source types and lastmod from it")
+    parser.add_argument('--new-catalog', default=None,
+                        help="new/catalog.parquet from extract.py: read new URLs and source types from it")
+    parser.add_argument('--out-dir', default='.', help="where the batch CSVs are written")
+    parser.add_argument('--checkpoint-dir', default=None, help="also save every intermediate table here")
+    parser.add_argument('--batch-size', type=int, default=250, help="max rows per batch file")
+    parser.add_argument('--max-batch-bytes', type=int, default=None, help="also cap each batch file's size")
+    parser.add_argument('--gzip', action='store_true', help="write the batches gzip-compressed")
+    parser.add_argument('--batch-workers', type=int, default=1, help="threads writing batch files")
+    parser.add_argument('--partial-mode', default='first', choices=['first', 'best'])
+    parser.add_argument('--format', default=None, choices=list(FORMATS),
+                        help="checkpoint table format (default: parquet when pyarrow is installed)")
+    parser.add_argument('--excel', action='store_true', help="also export every checkpoint as .xlsx")
+    parser.add_argument('--incremental', metavar='STATE', default=None,
+                        help="match-state file; only rematch old URLs affected by changes since the last run")
+    parser.add_argument('--old-manifest', default=None,
+                        help="extract_manifest.json from old/ (extract.py --incremental) for per-URL lastmod")
+    parser.add_argument('--approximate', action='store_true',
+                        help="blog keyword tier scores a MinHash/LSH shortlist instead of every blog post")
+    parser.add_argument('--match-cache', default=None, metavar='DB',
+                        help="SQLite file of match decisions reused across runs (created if missing)")
+    add_metrics_argument(parser)
+    parser.add_argument('--trace-memory', action='store_true', help="record allocations per stage (slower)")
+    parser.add_argument('--profile', type=float, nargs='?', const=0.005, default=None, metavar='INTERVAL',
+                        help="sample the call stack every INTERVAL seconds (default 0.005) into the metrics")
+    args = parser.parse_args()
+
+    metrics.reset(trace_memory=args.trace_memory, profile_interval=args.profile)
+
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    print("Loading URLs...")
+    old_types = new_types = lastmods = None
+    if args.old_catalog:
+        old_catalog = load_catalog(args.old_catalog)
+        old_urls = unique_urls(old_catalog['url'].tolist())
+        old_types, lastmods = source_types(old_catalog), catalog_lastmods(old_catalog)
+    else:
+        old_urls = unique_urls(pd.read_csv(args.old)['url'].tolist())
+    if args.new_catalog:
+        new_catalog = load_catalog(args.new_catalog)
+        new_urls = new_catalog['url'].tolist()
+        new_types = source_types(new_catalog)
+    else:
+        new_urls = pd.read_csv(args.new)['url'].tolist()
+    print(f"Loaded {len(old_urls)} old URLs and {len(new_urls)} new URLs")
+
+    if args.old_manifest:
+        lastmods = load_lastmods(args.old_manifest)
+    match_cache = MatchCache(args.match_cache) if args.match_cache else None
+    metrics.start_profiler()
+    try:
+        run_pipeline(old_urls, new_urls, args.out_dir, args.checkpoint_dir, args.batch_size,
+                     args.partial_mode, args.format, args.excel or None, args.incremental, lastmods,
+                     args.max_batch_bytes, args.gzip, args.batch_workers, args.approximate,
+                     old_types, new_types, match_cache)
+    finally:
+        metrics.stop_profiler()
+        if match_cache is not None:
+            match_cache.close()
+
+    save_metrics(args.metrics)
+
+if __name__ == "__main__":
+    main()
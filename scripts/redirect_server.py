@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from resolve_chains import DEFAULT_TABLES, REPO, load_redirect_tables
+from url_normalize import canonical_path
+
+# Reserved characters stay as they are; anything else outside ASCII is percent-encoded
+URL_SAFE = "/%?=&:@!$'()*+,;"
+
+def ascii_url(value):
+    """`value` percent-encoded (UTF-8) down to ASCII, so it fits a request line or a header"""
+    return quote(value, safe=URL_SAFE)
+
+def normalize_path(path):
+    """Lookup key used when the exact path misses: the canonical path (lowercase, escapes normalized, no trailing slash)"""
+    return canonical_path(path)
+
+class RedirectTable:
+    """Path -> target lookup: exact dict first, then a normalized (case/trailing slash) dict
+
+    Tables are read in priority order, so when two rows share a path (or
+    a normalized key) the earlier one wins, like in resolve_chains.
+    """
+
+    def __init__(self, paths):
+        self.paths = [Path(p) for p in paths]
+        self.exact = {}
+        self.normalized = {}
+        self.mtimes = {}
+        self.load()
+
+    def load(self):
+        df = load_redirect_tables(self.paths)
+        exact, normalized = {}, {}
+        for path, target in zip(df['path'], df['target']):
+            if not path.startswith('/'):
+                path = '/' + path
+            # Location headers are ASCII; encode once here instead of per response
+            target = ascii_url(target)
+            exact.setdefault(path, target)
+            normalized.setdefault(normalize_path(path), target)
+        # swap in one go so requests in flight never see a half-built table
+        self.exact, self.normalized = exact, normalized
+        self.mtimes = self.current_mtimes()
+        print(f"Loaded {len(exact)} redirects ({len(normalized)} normalized keys) from {len(self.paths)} tables")
+
+    def current_mtimes(self):
+        return {p: p.stat().st_mtime_ns for p in self.paths if p.exists()}
+
+    def changed(self):
+        return self.current_mtimes() != self.mtimes
+
+    def lookup(self, path):
+        target = self.exact.get(path)
+        if target is None:
+            target = self.normalized.get(normalize_path(path))
+        return target
+
+def response(status, reason, headers=()):
+    lines = [f"HTTP/1.1 {status} {reason}", "Content-Length: 0"]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+NOT_FOUND = response(404, 'Not Found')
+BAD_REQUEST = response(400, 'Bad Request', [('Connection', 'close')])
+
+async def handle(table, reader, writer):
+    """Answer every request on a keep-alive connection with a 301 or 404"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            # well-behaved clients send ASCII; raw UTF-8 still decodes, anything else becomes a miss
+            request_line = head.split(b"\r\n", 1)[0].decode('utf-8', errors='replace')
+            parts = request_line.split(' ')
+            if len(parts) != 3:
+                writer.write(BAD_REQUEST)
+                break
+            target = table.lookup(urlsplit(parts[1]).path)
+            if target is None:
+                writer.write(NOT_FOUND)
+            else:
+                writer.write(response(301, 'Moved Permanently', [('Location', target)]))
+            if b"connection: close" in head.lower():
+                break
+            await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def watch(table, interval):
+    """Reload the table whenever one of its CSVs changes on disk"""
+    while True:
+        await asyncio.sleep(interval)
+        if table.changed():
+            print("Redirect tables changed, reloading")
+            try:
+                table.load()
+            except Exception as e:
+                # keep serving the previous table if a CSV is mid-write or broken
+                print(f"Reload failed, keeping previous table: {e}")
+
+async def serve(table, host, port, reload_interval):
+    server = await asyncio.start_server(lambda r, w: handle(table, r, w), host, port)
+    print(f"Serving redirects on http://{host}:{port}")
+    watcher = asyncio.create_task(watch(table, reload_interval)) if reload_interval else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher:
+            watcher.cancel()
+
+async def client(host, port, paths, deadline, latencies, statuses):
+    """One keep-alive connection sending GETs back to back until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = random.choice(paths)
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('ascii'))
+            head = await reader.readuntil(b"\r\n\r\n")
+            latencies.append(time.perf_counter() - start)
+            status = head[9:12].decode('latin-1')
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def load_test(host, port, paths, connections, duration):
+    """Hammer the server from `connections` clients and report requests/sec and p50/p99 latency"""
+    latencies, statuses = [], {}
+    paths = [ascii_url(path) for path in paths]
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(host, port, paths, deadline, latencies, statuses)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"\n=== LOAD TEST ===")
+    print(f"Requests: {len(latencies)} in {elapsed:.2f}s over {connections} connections")
+    print(f"Throughput: {len(latencies) / elapsed:,.0f} req/s")
+    print(f"Latency p50: {percentile(latencies, 50) * 1000:.3f} ms, p99: {percentile(latencies, 99) * 1000:.3f} ms")
+    for status, count in sorted(statuses.items()):
+        print(f"  {status}: {count}")
+    return {'requests': len(latencies), 'seconds': elapsed, 'statuses': statuses,
+            'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99)}
+
+def sample_paths(table, miss_ratio=0.05):
+    """Request mix: every known path, some with case/slash variations, plus a few misses"""
+    paths = list(table.exact)
+    variants = [p.upper() if i % 3 == 0 else (p + '/' if not p.endswith('/') else p.rstrip('/') or '/')
+                for i, p in enumerate(paths[::10])]
+    misses = [f"/does-not-exist-{i}" for i in range(max(1, int(len(paths) * miss_ratio)))]
+    return paths + variants + misses
+
+async def bench(table, host, port, connections, duration):
+    """Start a server in-process and load test it"""
+    server = await asyncio.start_server(lambda r, w: handle(table, r, w), host, port)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await load_test(host, port, sample_paths(table), connections, duration)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local 301 redirect server and load generator")
+    parser.add_argument('mode', choices=['serve', 'bench'], help="serve the tables, or serve and load test them")
+    parser.add_argument('tables', nargs='*', help="redirect CSVs in priority order (default: the repo tables)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8301, help="0 picks a free port (bench)")
+    parser.add_argument('--reload-interval', type=float, default=2.0,
+                        help="seconds between checks for changed CSVs (0 disables hot reload)")
+    parser.add_argument('-c', '--connections', type=int, default=50, help="bench: concurrent connections")
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help="bench: seconds to run")
+    args = parser.parse_args()
+
+    table = RedirectTable(args.tables or [REPO / name for name in DEFAULT_TABLES])
+    if args.mode == 'serve':
+        try:
+            asyncio.run(serve(table, args.host, args.port, args.reload_interval))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(bench(table, args.host, args.port, args.connections, args.duration))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+REPO = Path(__file__).resolve().parent.parent
+
+# Tables in priority order: when two tables redirect the same path, the earlier one wins
+DEFAULT_TABLES = [
+    'shopify_redirects_blogs.csv',
+    'shopify_redirects_products.csv',
+    'shopify_redirects_others_exact_fuzzy.csv',
+    'products_only_in_old.csv',
+    'blogs_only_in_old.csv',
+    'shopify_redirects_others_root.csv',
+]
+
+HOSTS = ('https://tbfsna.myshopify.com', 'https://thebreastformstore.com')
+
+def redirect_key(value):
+    """Node key for a source or target: host stripped, leading slash, no trailing slash"""
+    value = str(value).strip()
+    for host in HOSTS:
+        if value.startswith(host):
+            value = value[len(host):]
+            break
+    if not value.startswith('/'):
+        value = '/' + value
+    if len(value) > 1 and value.endswith('/'):
+        value = value.rstrip('/') or '/'
+    return value
+
+def load_redirect_tables(paths):
+    """Concatenate redirect CSVs (Shopify 'Redirect from/to' or path/target) into one frame"""
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path)
+        if 'Redirect from' in df.columns:
+            df = df.rename(columns={'Redirect from': 'path', 'Redirect to': 'target'})
+        df = df[['path', 'target']].astype(str)
+        df['source_table'] = Path(path).name
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+def collapse_chains(df):
+    """Flatten multi-hop redirects so every source points at its final page in one hop
+
+    Paths are graph nodes keyed by redirect_key, with one outgoing edge
+    each (the first row for that key wins). Resolution follows edges
+    until it reaches a node that is not itself a source, then compresses
+    the whole walked path onto that final node, so every node is visited
+    a bounded number of times no matter how many chains share a tail. A
+    walk that revisits a node on its own stack is a cycle.
+
+    Every input row (first occurrence of each exact path) keeps its own
+    first hop and is then resolved through the graph. Self-redirects
+    (the old homepage '/' -> '/') are no-ops; cycle members and rows that
+    lead into a cycle cannot be resolved. All three are left out of the
+    flattened table and reported instead.
+
+    Returns (flat_df, report_df): flat_df has path/target/hops, report_df
+    has path/target/status with status 'self', 'cycle' or 'into_cycle'.
+    """
+    df = df.drop_duplicates(subset=['path'], keep='first')
+    paths = df['path'].tolist()
+    raw = df['target'].tolist()
+    keys = [redirect_key(p) for p in paths]
+    targets = [redirect_key(t) for t in raw]
+
+    edges = {}
+    raw_targets = {}
+    for key, target, written in zip(keys, targets, raw):
+        # a redirect onto itself is a no-op, not an edge
+        if target != key and key not in edges:
+            edges[key] = target
+            raw_targets[key] = written
+
+    # key -> (hops to the final page, final target as written), or None for cycle / into-cycle
+    resolved = {}
+    status = {}
+    for start in edges:
+        if start in resolved:
+            continue
+        stack = []
+        on_stack = set()
+        node = start
+        while node in edges and node not in resolved and node not in on_stack:
+            stack.append(node)
+            on_stack.add(node)
+            node = edges[node]
+
+        if node in on_stack:
+            # everything from the first visit of `node` onwards is the loop
+            loop_start = stack.index(node)
+            for member in stack[loop_start:]:
+                resolved[member] = None
+                status[member] = 'cycle'
+            for member in stack[:loop_start]:
+                resolved[member] = None
+                status[member] = 'into_cycle'
+            continue
+
+        if node in resolved:
+            tail = resolved[node]
+        else:
+            # not a source: final page, spelled as the last hop wrote it
+            tail = (0, raw_targets[stack[-1]])
+        # path compression: every node on the stack points straight at the end
+        for member in reversed(stack):
+            if tail is None:
+                resolved[member] = None
+                status[member] = 'into_cycle'
+            else:
+                tail = (tail[0] + 1, tail[1])
+                resolved[member] = tail
+
+    flat, report = [], []
+    for path, key, target, written in zip(paths, keys, targets, raw):
+        if target == key:
+            report.append({'path': path, 'target': written, 'status': 'self'})
+        elif target not in edges:
+            flat.append({'path': path, 'target': written, 'hops': 1})
+        elif resolved[target] is None:
+            report.append({'path': path, 'target': written,
+                           'status': 'cycle' if status.get(key) == 'cycle' else 'into_cycle'})
+        else:
+            hops, final = resolved[target]
+            flat.append({'path': path, 'target': final, 'hops': hops + 1})
+
+    flat_df = pd.DataFrame(flat, columns=['path', 'target', 'hops'])
+    report_df = pd.DataFrame(report, columns=['path', 'target', 'status'])
+
+    chains = int((flat_df['hops'] > 1).sum())
+    print(f"Resolved {len(flat_df)} redirects: {chains} chains collapsed, "
+          f"{(report_df['status'] == 'self').sum()} self-redirects dropped, "
+          f"{(report_df['status'] == 'cycle').sum()} in cycles, "
+          f"{(report_df['status'] == 'into_cycle').sum()} leading into cycles")
+    return flat_df, report_df
+
+def main():
+    parser = argparse.ArgumentParser(description="Collapse redirect chains and report loops")
+    parser.add_argument('tables', nargs='*', help="redirect CSVs in priority order (default: the repo tables)")
+    parser.add_argument('-o', '--output', default='shopify_redirects_flat.csv')
+    parser.add_argument('--report', default='redirect_cycles.csv', help="self-redirects and loops left out")
+    args = parser.parse_args()
+
+    tables = args.tables or [REPO / name for name in DEFAULT_TABLES]
+    df = load_redirect_tables(tables)
+    print(f"Loaded {len(df)} redirects from {len(tables)} tables")
+
+    flat_df, report_df = collapse_chains(df)
+
+    flat_df[['path', 'target']].to_csv(args.output, index=False, header=['Redirect from', 'Redirect to'])
+    print(f"Saved flattened redirects to: {args.output}")
+    if len(report_df):
+        report_df.to_csv(args.report, index=False)
+        print(f"Saved cycle report to: {args.report}")
+        for _, row in report_df.head(10).iterrows():
+            print(f"  [{row['status']}] {row['path']} -> {row['target']}")
+
+if __name__ == "__main__":
+    main()
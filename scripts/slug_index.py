@@ -0,0 +1,81 @@
+from containment import ContainmentMatcher
+from url_records import parse_url
+
+def default_slug(url):
+    """Extract the last part of URL path as slug"""
+    return parse_url(url).slug
+
+class SlugIndex:
+    """Prebuilt slug lookups over a list of new URLs.
+
+    Answers the same questions as the nested loops in find_best_match
+    (first URL with an equal slug, first URL whose slug contains or is
+    contained in the old slug) without rescanning the URL list. "First"
+    always means lowest position in the original list, so results match
+    the linear scans exactly.
+    """
+
+    def __init__(self, urls, slug_of=default_slug):
+        self.urls = list(urls)
+        self.slug_of = slug_of
+        self.slugs = [slug_of(url) for url in self.urls]
+
+        # slug -> first position it appears at
+        self.exact = {}
+        for pos, slug in enumerate(self.slugs):
+            if slug:
+                self.exact.setdefault(slug, pos)
+        # containment ids follow first-appearance order, so they map to positions monotonically
+        self.positions = list(self.exact.values())
+        self.containment = ContainmentMatcher(self.exact)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def exact_position(self, slug):
+        """Position of the first URL whose slug equals `slug`, or None"""
+        if not slug:
+            return None
+        return self.exact.get(slug)
+
+    def partial_position(self, slug, mode='first'):
+        """Position of the URL whose slug contains or is contained in `slug`
+
+        None when there is none; for mode 'all', the list of every
+        such position (empty when there is none).
+        """
+        found = self.containment.match(slug, mode)
+        if mode == 'all':
+            return [self.positions[i] for i in found]
+        return self.positions[found] if found != -1 else None
+
+    def exact_match(self, slug):
+        pos = self.exact_position(slug)
+        return self.urls[pos] if pos is not None else None
+
+    def partial_match(self, slug, mode='first'):
+        pos = self.partial_position(slug, mode)
+        if mode == 'all':
+            return [self.urls[p] for p in pos]
+        return self.urls[pos] if pos is not None else None
+
+# Indexes built for plain lists, kept next to the list itself so its id cannot be reused
+_built = {}
+MAX_BUILT = 8
+
+def index_for(urls, slug_of=default_slug):
+    """SlugIndex over `urls`, built once per list object and reused on later calls
+
+    A prebuilt SlugIndex is returned as is. A list that grew or shrank
+    since is reindexed; editing it in place at the same length is not
+    detected, so build a SlugIndex yourself for lists that change.
+    """
+    if isinstance(urls, SlugIndex):
+        return urls
+    key = (id(urls), slug_of)
+    entry = _built.get(key)
+    if entry is None or entry[0] is not urls or entry[1] != len(urls):
+        if key not in _built and len(_built) >= MAX_BUILT:
+            _built.pop(next(iter(_built)))
+        entry = _built[key] = (urls, len(urls), SlugIndex(urls, slug_of))
+    return entry[2]
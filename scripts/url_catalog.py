@@ -0,0 +1,85 @@
+import csv
+from pathlib import Path
+
+import pandas as pd
+
+# Source types (extract.py SOURCE_TYPES) an old URL may be slug-matched against.
+# Old types missing here are compared against the whole new catalog; an empty
+# tuple skips slug matching and goes straight to the category fallback.
+COMPARABLE = {
+    'product': ('product',),
+    'post': ('post',),
+    'blog_category': ('post',),
+    'blog_tag': ('post',),
+    'product_category': ('collection', 'product'),
+    'product_tag': ('collection', 'product'),
+    'attribute': ('collection', 'product'),
+    'page': ('page',),
+    'contest': (),
+    'sitemap': (),
+}
+
+# Source type -> the page-type category the 'catalog' ruleset would guess from the path,
+# so typed and untyped URLs land in the same diff_urls files
+CATEGORIES = {
+    'product': 'product',
+    'post': 'blog',
+    'blog_category': 'blog',
+    'blog_tag': 'taxonomy',
+    'collection': 'collection',
+    'product_category': 'collection',
+    'product_tag': 'collection',
+    'attribute': 'collection',
+    'page': 'page',
+    'author': 'taxonomy',
+    'contest': 'taxonomy',
+    'sitemap': 'other',
+}
+
+# Old source types the blog matcher redirects to new blog articles
+BLOG_SOURCES = ('post', 'blog_category', 'blog_tag')
+
+def find_catalog(directory):
+    """catalog.parquet (or catalog.csv) written by extract.py into `directory`, or None"""
+    for name in ('catalog.parquet', 'catalog.csv'):
+        path = Path(directory) / name
+        if path.exists():
+            return path
+    return None
+
+def iter_sources(path, batch_size=65_536):
+    """(url, source) rows of a catalog, streamed so a big catalog never sits in memory whole"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=['url', 'source']):
+            columns = batch.to_pydict()
+            yield from zip(columns['url'], columns['source'])
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield row['url'], row['source']
+
+def load_catalog(path):
+    """url/source/lastmod/host frame written by extract.py (catalog.parquet or catalog.csv)"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df['lastmod'] = df['lastmod'].replace('', None)
+    df['source'] = df['source'].astype(str)
+    print(f"Loaded catalog {path}: " + ', '.join(f"{source} {n}" for source, n in df['source'].value_counts().items()))
+    return df
+
+def source_types(df):
+    """url -> source type"""
+    return dict(zip(df['url'], df['source']))
+
+def lastmods(df):
+    """url -> lastmod, in the same shape as incremental.load_lastmods"""
+    return {url: (None if pd.isna(lastmod) else lastmod) for url, lastmod in zip(df['url'], df['lastmod'])}
+
+def comparable_group(url, old_types):
+    """New source types `url` may match, or None when it is untyped"""
+    return COMPARABLE.get(old_types.get(url)) if old_types else None
@@ -0,0 +1,115 @@
+from containment import AhoCorasick
+
+SHOP = 'https://tbfsna.myshopify.com'
+
+# Declarative rule tables. Rules are tried in order and the first rule with
+# a keyword anywhere in the lowercased URL wins; `targets` are the fallback
+# redirects per category.
+RULESETS = {
+    # create_redirects_fast.categorize_url
+    'fast': {
+        'rules': [
+            ('blog', ['/blog', 'crossdressing', 'tutorial']),
+            ('product', ['breast-form', 'bra', 'wig', 'product', 'brand', 'size']),
+        ],
+        'default': 'other',
+        'targets': {
+            'blog': f'{SHOP}/blogs/community-stories',
+            'product': f'{SHOP}/collections/breast-forms',
+            'other': f'{SHOP}/',
+        },
+    },
+    # create_comprehensive_redirects.extract_keywords
+    'comprehensive': {
+        'rules': [
+            ('blog', ['blog', 'tips', 'tutorial', 'guide', 'how-to', 'crossdressing',
+                      'transgender', 'feminization', 'makeup', 'beauty', 'stories',
+                      'community', 'experience', 'coming-out', 'gender']),
+            ('product', ['breast-form', 'bra', 'wig', 'shoe', 'heel', 'lingerie', 'panty',
+                         'adhesive', 'tape', 'size', 'color', 'brand', 'style', 'product']),
+            ('blog', ['/blog/', '/blogs/']),
+            ('product', ['product', 'shop', 'store', 'brand', 'size']),
+        ],
+        'default': 'other',
+        'targets': {
+            'blog': f'{SHOP}/blogs/community-stories',
+            'product': f'{SHOP}/collections/breast-forms',
+            'other': f'{SHOP}/',
+        },
+    },
+    # fix_blog_redirects_new.is_blog_url
+    'blog': {
+        'rules': [
+            ('blog', ['/blog/', 'crossdressing', 'tutorial', 'tips', 'guide', 'how-to',
+                      'transgender', 'feminization', 'makeup', 'beauty', 'story', 'experience']),
+        ],
+        'default': 'other',
+        'targets': {},
+    },
+    # fix_blog_redirects_new: fallback blog for unmatched old posts
+    'blog_fallback': {
+        'rules': [
+            ('beauty', ['beauty', 'makeup', 'feminine']),
+            ('cd-tg-tips', ['tips', 'crossdressing', 'tutorial']),
+            ('breast-forms-breast-form-care', ['breast-form', 'bra', 'lingerie']),
+            ('body-shaping', ['body', 'shaping', 'curve']),
+        ],
+        'default': 'community-stories',
+        'targets': {
+            'beauty': f'{SHOP}/blogs/beauty',
+            'cd-tg-tips': f'{SHOP}/blogs/cd-tg-tips',
+            'breast-forms-breast-form-care': f'{SHOP}/blogs/breast-forms-breast-form-care',
+            'body-shaping': f'{SHOP}/blogs/body-shaping',
+            'community-stories': f'{SHOP}/blogs/community-stories',
+        },
+    },
+    # diff_urls: what kind of page a URL is, on either site (WordPress or Shopify paths)
+    'catalog': {
+        'rules': [
+            ('blog', ['/blogs/', '/blog/', '/category/']),
+            ('product', ['/products/', '/product/']),
+            ('collection', ['/collections/', '/product-category/', '/product-tag/', '/product_cat/']),
+            ('page', ['/pages/']),
+            ('taxonomy', ['/tag/', '/author/', '/contest/']),
+        ],
+        'default': 'other',
+        'targets': {},
+    },
+}
+
+class Categorizer:
+    """URL classifier compiled from a rule table into one Aho-Corasick automaton.
+
+    Keywords get pattern ids in rule order, so the smallest id seen while
+    scanning the URL once belongs to the highest-priority matching rule.
+    """
+
+    def __init__(self, rules, default, targets=None):
+        self.default = default
+        self.targets = dict(targets or {})
+        self.categories = []
+        keywords = []
+        for category, words in rules:
+            for word in words:
+                keywords.append(word.lower())
+                self.categories.append(category)
+        self.matcher = AhoCorasick(keywords)
+
+    def classify(self, url):
+        hit = self.matcher.first(url.lower())
+        return self.categories[hit] if hit != -1 else self.default
+
+    def classify_many(self, urls):
+        return [self.classify(url) for url in urls]
+
+    def target(self, url):
+        """Fallback redirect target for url's category (None if the table has none)"""
+        return self.targets.get(self.classify(url))
+
+_compiled = {}
+
+def get_categorizer(name):
+    """Compiled Categorizer for one of the RULESETS, built once per process"""
+    if name not in _compiled:
+        _compiled[name] = Categorizer(**RULESETS[name])
+    return _compiled[name]
@@ -0,0 +1,112 @@
+import re
+from hashlib import blake2b
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit
+
+import pandas as pd
+
+SLASHES_RE = re.compile(r'/{2,}')
+ESCAPE_RE = re.compile(r'%([0-9A-Fa-f]{2})')
+# runs of escaped bytes >= 0x80: UTF-8 encoded non-ASCII characters
+NON_ASCII_ESCAPES_RE = re.compile(r'(?:%[89A-Fa-f][0-9A-Fa-f])+')
+# RFC 3986 section 2.3; escapes of anything else (%2F, %3F, ...) keep their meaning
+UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+# characters left as they are when escaping the path again: reserved delimiters plus '%'
+PATH_SAFE = "/:@!$&'()*+,;=-._~%"
+
+def decode_unreserved(match):
+    char = chr(int(match.group(1), 16))
+    return char if char in UNRESERVED else match.group(0)
+
+def decode_non_ascii(match):
+    try:
+        return unquote(match.group(0), errors='strict')
+    except UnicodeDecodeError:
+        return match.group(0)
+
+def normalize_escapes(path):
+    """Path with percent-encoding normalized (RFC 3986 section 6.2.2), lowercased
+
+    Escaped unreserved characters are decoded and escaped UTF-8 is
+    decoded so it can be lowercased, then every non-ASCII or unsafe
+    character is escaped again with uppercase hex. Escaped delimiters
+    such as %2F stay escaped, so '/a%2Fb' and '/a/b' remain different.
+    """
+    path = ESCAPE_RE.sub(decode_unreserved, path)
+    path = NON_ASCII_ESCAPES_RE.sub(decode_non_ascii, path).lower()
+    return ESCAPE_RE.sub(lambda m: m.group(0).upper(), quote(path, safe=PATH_SAFE))
+
+def split_url(value):
+    value = str(value).strip()
+    # a bare path starting with '//' would otherwise be read as a host
+    return urlsplit('http://host' + value if value.startswith('/') else value)
+
+def canonical_path(value, keep_query=False):
+    """Canonical form of a redirect source: path only, lowercase, no trailing slash
+
+    Shopify matches 'Redirect from' ignoring case and the trailing slash,
+    so '/Foo/', '/foo' and '/f%6Fo' are the same redirect. The query
+    string and fragment are dropped unless keep_query, which keeps the
+    query with its parameters sorted.
+    """
+    parts = split_url(value)
+    path = SLASHES_RE.sub('/', normalize_escapes(parts.path))
+    if not path.startswith('/'):
+        path = '/' + path
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    if keep_query and parts.query:
+        path += '?' + urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return path
+
+def canonical_host(value):
+    """Lowercase host of a full URL, '' for a bare path"""
+    value = str(value).strip()
+    return '' if value.startswith('/') else (split_url(value).hostname or '')
+
+def canonical_key(value, keep_query=False, with_host=False):
+    """64-bit hash of canonical_path (prefixed with canonical_host if with_host), cheap to group and join on"""
+    key = canonical_path(value, keep_query)
+    if with_host:
+        key = canonical_host(value) + key
+    digest = blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+def canonical_keys(values, keep_query=False, with_host=False):
+    """canonical_key for a column, computed once per distinct value"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    keys = [canonical_key(value, keep_query, with_host) for value in uniques]
+    return pd.Series(keys, dtype='int64').to_numpy()[codes]
+
+def unique_urls(urls, keep_query=False):
+    """URLs with equivalent paths on the same host collapsed to their first occurrence, before matching
+
+    The host is part of the key: the same path on the old and the new
+    domain is two different URLs, and the old one must survive.
+    """
+    keys = canonical_keys(urls, keep_query, with_host=True)
+    first = ~pd.Series(keys).duplicated().to_numpy()
+    kept = [url for url, keep in zip(urls, first) if keep]
+    print(f"Normalized {len(urls)} URLs: {len(urls) - len(kept)} equivalent duplicates removed")
+    return kept
+
+def dedupe_redirects(df, keep_query=False):
+    """Drop rows whose 'path' is equivalent to an earlier row's, before export
+
+    Returns (kept_df, removed_df); removed_df lists each dropped path
+    with the path it collapsed into and both targets, so a conflicting
+    target is visible in the report.
+    """
+    keys = canonical_keys(df['path'].tolist(), keep_query)
+    duplicated = pd.Series(keys).duplicated().to_numpy()
+    kept_df = df.loc[~duplicated]
+
+    first = pd.DataFrame({'key': keys[~duplicated], 'kept_path': kept_df['path'].to_numpy(),
+                          'kept_target': kept_df['target'].to_numpy()})
+    removed_df = pd.DataFrame({'key': keys[duplicated], 'path': df['path'].to_numpy()[duplicated],
+                               'target': df['target'].to_numpy()[duplicated]})
+    removed_df = removed_df.merge(first, on='key', how='left').drop(columns='key')
+
+    conflicts = int((removed_df['target'] != removed_df['kept_target']).sum())
+    print(f"Normalized {len(df)} redirects: {len(removed_df)} equivalent rows removed "
+          f"({conflicts} with a different target, first row kept)")
+    return kept_df, removed_df
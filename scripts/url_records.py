@@ -0,0 +1,102 @@
+import re
+import sys
+from urllib.parse import urlparse
+
+TOKEN_RE = re.compile(r'\b\w+\b')
+
+def tokenize(slug):
+    """Split a slug into keyword tokens"""
+    return TOKEN_RE.findall(slug.replace('-', ' '))
+
+class UrlRecord:
+    """One parsed URL: scheme/host as ids into the cache's intern tables, plus path, slug and tokens"""
+
+    __slots__ = ('url', 'scheme_id', 'host_id', 'path', 'relative', 'slug', 'tokens', '_cache')
+
+    def __init__(self, url, scheme_id, host_id, path, relative, slug, tokens, cache):
+        self.url = url
+        self.scheme_id = scheme_id
+        self.host_id = host_id
+        self.path = path          # path only, e.g. /blogs/beauty/foo
+        self.relative = relative  # everything after the host (path, query, fragment)
+        self.slug = slug          # last non-empty path segment
+        self.tokens = tokens
+        self._cache = cache
+
+    @property
+    def scheme(self):
+        return self._cache.schemes[self.scheme_id]
+
+    @property
+    def host(self):
+        return self._cache.hosts[self.host_id]
+
+    def __repr__(self):
+        return f"UrlRecord({self.url!r})"
+
+class UrlCache:
+    """Parses each distinct URL once and hands out the same UrlRecord afterwards.
+
+    Hosts and schemes are interned into small tables so millions of
+    records share a handful of strings; slugs are interned too since many
+    URLs end in the same segment.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.hosts = []
+        self.schemes = []
+        self._host_ids = {}
+        self._scheme_ids = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _intern(self, value, table, ids):
+        i = ids.get(value)
+        if i is None:
+            i = ids[value] = len(table)
+            table.append(value)
+        return i
+
+    def parse(self, url):
+        record = self.records.get(url)
+        if record is not None:
+            self.hits += 1
+            return record
+        self.misses += 1
+        try:
+            parts = urlparse(url)
+            scheme, host, path = parts.scheme, parts.netloc, parts.path
+            relative = url.split(host, 1)[1] if host else (path if scheme else url)
+        except Exception:
+            scheme = host = path = relative = ''
+        stripped = path.strip('/')
+        slug = sys.intern(stripped.split('/')[-1]) if stripped else ''
+        record = UrlRecord(
+            url,
+            self._intern(scheme, self.schemes, self._scheme_ids),
+            self._intern(host, self.hosts, self._host_ids),
+            path,
+            relative,
+            slug,
+            tuple(tokenize(slug)),
+            self,
+        )
+        self.records[url] = record
+        return record
+
+    def parse_many(self, urls):
+        return [self.parse(url) for url in urls]
+
+    def __len__(self):
+        return len(self.records)
+
+    def clear(self):
+        self.records.clear()
+
+# Shared by every stage in a process
+default_cache = UrlCache()
+
+def parse_url(url):
+    """Cached UrlRecord for url from the shared cache"""
+    return default_cache.parse(url)
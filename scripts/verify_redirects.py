@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import random
+import ssl
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import unquote, urljoin, urlsplit
+
+import pandas as pd
+
+from resolve_chains import DEFAULT_TABLES, REPO, load_redirect_tables, redirect_key
+from redirect_server import ascii_url, response
+
+NEW_STORE = 'https://tbfsna.myshopify.com'
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def sitemap_keys(path):
+    """redirect_key of every URL in a sitemap dump (new/all_urls.txt)"""
+    return {redirect_key(url) for url in Path(path).read_text(encoding='utf-8').split()}
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection to a host"""
+
+    def __init__(self, scheme, host, port):
+        self.scheme, self.host, self.port = scheme, host, port
+        self.reader = self.writer = None
+
+    async def open(self, timeout):
+        context = ssl.create_default_context() if self.scheme == 'https' else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), timeout)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, timeout):
+        """(status, headers) for one request; the body (GET only) is read and dropped"""
+        if self.writer is None:
+            await self.open(timeout)
+        self.writer.write(f"{method} {ascii_url(path)} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"User-Agent: tbfs-redirect-verifier\r\n\r\n".encode('ascii'))
+        await self.writer.drain()
+        head = await asyncio.wait_for(self.reader.readuntil(b"\r\n\r\n"), timeout)
+        lines = head.decode('latin-1').split("\r\n")
+        status = int(lines[0].split(' ', 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        reusable = True
+        if method == 'GET':
+            reusable = await asyncio.wait_for(self.drain_body(status, headers), timeout)
+        if not reusable or headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, headers
+
+    async def drain_body(self, status, headers):
+        """Read and drop a GET body; False when it runs to EOF, so the connection cannot be reused"""
+        if status in (204, 304) or 100 <= status < 200:
+            return True
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    return True
+        if 'content-length' not in headers:
+            # body delimited by the server closing the connection: leftover bytes would
+            # be read as the next response, so close instead of reading it all
+            return False
+        length = int(headers['content-length'])
+        if length:
+            await self.reader.readexactly(length)
+        return True
+
+async def check_target(connections, url, timeout, retries):
+    """Fetch one target with HEAD (GET if HEAD is refused), retrying transient failures"""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = Connection(*key)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            # exponential backoff with jitter so retries do not arrive in lockstep
+            await asyncio.sleep(min(4.0, 0.1 * 2 ** attempt) * (0.5 + random.random()))
+        try:
+            status, headers = await conn.request('HEAD', path, timeout)
+            if status in (405, 501):
+                status, headers = await conn.request('GET', path, timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            conn.close()
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            continue
+        if status in RETRY_STATUSES and attempt < retries:
+            error = f"HTTP {status}"
+            continue
+        return status, headers.get('location'), None
+    return None, None, error
+
+def target_url(base_url, target, rebase=False):
+    """URL to fetch for `target`; with rebase, absolute targets keep only their path and query
+
+    urljoin leaves an absolute target on its own host, which is right for
+    the live store but would send a mock run out to the real site.
+    """
+    if rebase:
+        parts = urlsplit(target)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    return urljoin(base_url, target)
+
+async def verify_targets(targets, base_url, concurrency=32, timeout=10.0, retries=2, rebase=False):
+    """target -> (status, location, error), checked by `concurrency` workers with their own pooled connections
+
+    rebase sends every target, absolute ones included, to base_url (see target_url).
+    """
+    queue = asyncio.Queue()
+    for target in targets:
+        queue.put_nowait(target)
+    results = {}
+
+    async def worker():
+        connections = {}
+        try:
+            while True:
+                try:
+                    target = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results[target] = await check_target(connections, target_url(base_url, target, rebase),
+                                                     timeout, retries)
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(targets)) or 1)))
+    return results
+
+def classify(status, location, error, in_sitemap):
+    if error:
+        return 'error'
+    if status == 404:
+        return 'not_found'
+    if 300 <= status < 400:
+        return 'redirects_again'
+    if status >= 400:
+        return 'http_error'
+    if not in_sitemap:
+        return 'not_in_sitemap'
+    return 'ok'
+
+async def mock_store(known, host='127.0.0.1', port=0):
+    """Local stand-in for the new store: 200 for sitemap URLs, 404 for anything else"""
+    ok = response(200, 'OK')
+    missing = response(404, 'Not Found')
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                # requests arrive percent-encoded; the sitemap keys are not
+                path = unquote(head.split(b' ', 2)[1].decode('ascii', errors='replace'))
+                writer.write(ok if redirect_key(urlsplit(path).path) in known else missing)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+def verify(df, known, base_url=NEW_STORE, mock=False, concurrency=32, timeout=10.0, retries=2):
+    """Check every distinct target of a path/target frame, one report row per target
+
+    With mock set, base_url is ignored and the targets, absolute ones
+    included, are checked against a mock_store on a free local port,
+    inside the same event loop.
+    """
+    counts = Counter(df['target'])
+
+    async def run():
+        if not mock:
+            return base_url, await verify_targets(list(counts), base_url, concurrency, timeout, retries)
+        server = await mock_store(known)
+        local_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        async with server:
+            return local_url, await verify_targets(list(counts), local_url, concurrency, timeout, retries,
+                                                   rebase=True)
+
+    print(f"Checking {len(counts)} distinct targets from {len(df)} redirects"
+          f"{' against a mock store' if mock else ' against ' + base_url}")
+    start = time.perf_counter()
+    checked_url, results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for target, count in counts.items():
+        status, location, error = results[target]
+        in_sitemap = redirect_key(target) in known
+        rows.append({'target': target, 'redirects': count, 'status': status,
+                     'in_sitemap': in_sitemap, 'location': location, 'error': error,
+                     'issue': classify(status, location, error, in_sitemap)})
+    print(f"Checked {len(counts)} targets in {elapsed:.2f}s ({len(counts) / elapsed:,.0f}/s) at {checked_url}")
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every redirect target exists on the new store")
+    parser.add_argument('tables', nargs='*', help="redirect CSVs (default: the repo tables)")
+    parser.add_argument('--base-url', default=NEW_STORE, help="store that relative targets are resolved against")
+    parser.add_argument('--mock', action='store_true',
+                        help="check against a local mock store serving new/all_urls.txt instead")
+    parser.add_argument('--sitemap', default=REPO / 'new' / 'all_urls.txt')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('-o', '--output', default='redirect_verification.csv')
+    args = parser.parse_args()
+
+    df = load_redirect_tables(args.tables or [REPO / name for name in DEFAULT_TABLES])
+    known = sitemap_keys(args.sitemap)
+
+    report = verify(df, known, args.base_url, args.mock, args.concurrency, args.timeout, args.retries)
+
+    report.to_csv(args.output, index=False)
+    print(f"Saved report to: {args.output}")
+
+    print(f"\n=== VERIFICATION SUMMARY ===")
+    for issue, group in report.groupby('issue'):
+        print(f"  {issue}: {len(group)} targets, {group['redirects'].sum()} redirects")
+    for _, row in report[report['issue'] != 'ok'].sort_values('redirects', ascending=False).head(10).iterrows():
+        print(f"  [{row['issue']}] {row['target']} ({row['redirects']} redirects)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the scripts import their siblings by name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from slug_index import SlugIndex
+
+URLS = [
+    'https://example.com/products/pink-foo-forms',
+    'https://example.com/products/foo',
+    'https://example.com/blogs/news/foo-bar',
+    'https://example.com/products/foo',
+    'https://example.com/pages/about',
+]
+
+@pytest.fixture
+def index():
+    return SlugIndex(URLS)
+
+def test_exact(index):
+    assert index.exact_match('foo') == URLS[1]
+    assert index.exact_match('missing') is None
+
+def test_partial_first(index):
+    assert index.partial_position('foo') == 0
+    assert index.partial_match('foo', 'first') == URLS[0]
+    assert index.partial_match('nothing-here', 'first') is None
+
+def test_partial_best(index):
+    # closest length to the query wins, ties to the earlier URL
+    assert index.partial_match('foo', 'best') == URLS[1]
+    assert index.partial_match('nothing-here', 'best') is None
+
+def test_partial_all(index):
+    # duplicate slugs report their first URL only, in list order
+    assert index.partial_position('foo', 'all') == [0, 1, 2]
+    assert index.partial_match('foo', 'all') == URLS[:3]
+    assert index.partial_match('nothing-here', 'all') == []
+
+def test_unknown_mode(index):
+    with pytest.raises(ValueError):
+        index.partial_match('foo', 'most')